@@ -1,8 +1,15 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, make_response
 from flask_cors import CORS
-from models_simple import get_db, init_db
-import random
-import string
+from models_simple import init_db_pool, is_image_url, prepare_image, read_test_stats
+from question_import import QuestionImportError, iter_questions, normalize_question
+from cache import LRUCache
+from storage import create_storage
+from compression import choose_encoding, encoded_etag, init_compression, render_page
+from metrics import init_metrics, render_prometheus
+from sql_trace import init_sql_trace
+from scoring import invalidate_answer_key, to_answer_map, answer_key_cache_stats
+import base64
+import binascii
 import os
 
 # Flask app yaratish - templates va static papkalarini ko'rsatish
@@ -20,34 +27,114 @@ CORS(app, resources={
     }
 })
 
-# Database yaratish - lazy initialization (faqat kerak bo'lganda)
-_db_initialized = False
+# So'rov tugaganda connection ni pool'ga qaytarish
+init_db_pool(app)
+
+# Route bo'yicha kechikish va SQL metrikalari (/api/metrics).
+# Siqishdan oldin ro'yxatdan o'tadi - siqish vaqti ham o'lchanadi.
+init_metrics(app)
+
+# SQL tracing va N+1 aniqlash: SQL_TRACE=1 (faqat ogohlantirishlar) yoki
+# SQL_TRACE=verbose (har bir so'rov hisoboti va X-SQL-* sarlavhalar)
+SQL_TRACE = os.environ.get('SQL_TRACE', '0')
+if SQL_TRACE != '0':
+    init_sql_trace(app, verbose=SQL_TRACE == 'verbose')
+
+# JSON javoblarni siqish, static fayllarni oldindan siqilgan holda berish
+init_compression(app, min_size=int(os.environ.get('COMPRESS_MIN_SIZE', 500)))
+
+# Ma'lumotlar ombori: STORAGE_BACKEND=sqlite (standart) yoki memory (faqat RAM)
+storage = create_storage()
 
 def ensure_db():
-    """Database ni faqat kerak bo'lganda yaratish"""
-    global _db_initialized
-    if not _db_initialized:
-        try:
-            init_db()
-            _db_initialized = True
-        except Exception as e:
-            print(f"Database initialization warning: {e}")
-            _db_initialized = True  # Xatolikni qayta-qayta ko'rsatmaslik uchun
-
-def safe_get_db():
-    """Database connection olish, xatolikni boshqarish"""
+    """Omborni faqat kerak bo'lganda tayyorlash (SQLite: sxema migratsiyalari)"""
+    storage.init()
+
+# get_test javoblari uchun kesh (test_id -> (katalog etag, payload)).
+# Yozuv faqat katalog versiyasi o'zgarmagan bo'lsa ishlatiladi: boshqa
+# worker jarayonida o'chirilgan test ko'pi bilan CATALOG_VERSION_TTL
+# ichida keshdan chiqadi.
+_test_cache = LRUCache(maxsize=int(os.environ.get('TEST_CACHE_SIZE', 256)))
+
+def image_url(test_id, image_hash, legacy_image=None):
+    """Test rasmi uchun URL (rasmning o'zi javobga qo'shilmaydi)"""
+    if image_hash:
+        return f'/api/tests/{test_id}/image?v={image_hash}'
+    return legacy_image  # Eski yozuvlar: tashqi URL bo'lishi mumkin
+
+# /api/tests/import da ruxsat etilgan eng ko'p savollar soni
+IMPORT_MAX_QUESTIONS = int(os.environ.get('IMPORT_MAX_QUESTIONS', 5000))
+
+# GET /api/tests sahifa o'lchami
+TESTS_PAGE_DEFAULT = 50
+TESTS_PAGE_MAX = 200
+SEARCH_MAX_LENGTH = 100
+
+# Reyting: foiz, to'g'ri javoblar soni, tezroq tugatgan yuqorida (storage.RANK_ORDER)
+LEADERBOARD_DEFAULT = 10
+LEADERBOARD_MAX = 100
+
+# GET /api/results/<test_id> sahifa o'lchami va qaytariladigan maydonlar
+RESULTS_PAGE_DEFAULT = 100
+RESULTS_PAGE_MAX = 500
+USER_RESULTS_PAGE_DEFAULT = 50
+USER_RESULTS_PAGE_MAX = 200
+RESULT_FIELDS = [
+    'id', 'user_name', 'user_id', 'score', 'correct_answers', 'total_questions', 'completed_at'
+]
+
+def encode_cursor(*values):
+    """Keyset pagination uchun cursor (oxirgi qatorning tartiblash kalitlari)"""
+    raw = '\x1f'.join(str(v) for v in values)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, count):
+    """Cursor ni qiymatlar ro'yxatiga aylantirish, noto'g'ri bo'lsa ValueError"""
     try:
-        ensure_db()
-        return get_db()
-    except Exception as e:
-        error_msg = str(e)
-        if "SQLite" in error_msg or "read-only" in error_msg.lower():
-            raise Exception("SQLite Vercel'da ishlamaydi. Iltimos, cloud database (Vercel Postgres, Supabase, va hokazo) sozlang.")
-        raise
-
-def generate_test_id():
-    """6 xonali test ID yaratish"""
-    return ''.join(random.choices(string.digits, k=6))
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    except (binascii.Error, UnicodeError):
+        raise ValueError('Cursor noto\'g\'ri')
+    values = raw.split('\x1f')
+    if len(values) != count:
+        raise ValueError('Cursor noto\'g\'ri')
+    return values
+
+def parse_limit(default, maximum):
+    """?limit= parametrini o'qish va chegaralash"""
+    limit = request.args.get('limit', default)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError('limit son bo\'lishi kerak')
+    return max(1, min(limit, maximum))
+
+def catalog_not_modified(version):
+    """If-None-Match katalog versiyasiga mos kelsa 304 javob
+
+    Faqat If-Modified-Since bilan kelgan so'rovga 304 berilmaydi:
+    Last-Modified soniyagacha yaxlitlanadi va bir soniya ichidagi ikkinchi
+    o'zgarishdan keyin eskirgan 304 qaytishi mumkin. If-None-Match bo'lsa,
+    make_conditional If-Modified-Since ni e'tiborsiz qoldiradi (RFC 9110).
+    """
+    if version is None or not request.if_none_match:
+        return None
+    response = set_catalog_headers(make_response('', 200), version)
+    # Siqilgan javob ETag i kodlash bilan keladi (compression.encoded_etag)
+    etag = encoded_etag(version[0], choose_encoding())
+    if request.if_none_match.contains(etag):
+        response.set_etag(etag)
+    response.make_conditional(request)
+    return response if response.status_code == 304 else None
+
+def set_catalog_headers(response, version):
+    """Katalog javobiga ETag, Last-Modified va Cache-Control qo'shish"""
+    if version is not None:
+        etag, last_modified = version
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        # Har safar qayta tekshirish (If-None-Match), lekin o'zgarmagan bo'lsa 304
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 # ============ USER ENDPOINTS ============
 
@@ -62,31 +149,19 @@ def login():
     
     if not name or not user_id:
         return jsonify({'error': 'Ism va ID kiritilishi shart'}), 400
+    user_id = str(user_id)
     
+    # Mavjud foydalanuvchining ismi o'zgarmaydi
     try:
-        conn = safe_get_db()
+        user_name = storage.login(user_id, name)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    cursor = conn.cursor()
-    
-    # Foydalanuvchini topish
-    cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-    user = cursor.fetchone()
-    
-    if not user:
-        # Yangi foydalanuvchi yaratish
-        cursor.execute('INSERT INTO users (id, name) VALUES (?, ?)', (user_id, name))
-        conn.commit()
-        cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-        user = cursor.fetchone()
-    
-    conn.close()
     
     return jsonify({
         'success': True,
         'user': {
-            'id': user['id'],
-            'name': user['name']
+            'id': user_id,
+            'name': user_name
         }
     })
 
@@ -94,86 +169,104 @@ def login():
 
 @app.route('/api/tests', methods=['GET'])
 def get_tests():
-    """Barcha testlarni olish"""
+    """Testlar ro'yxatini sahifalab olish
+
+    Query parametrlar: limit, cursor (oldingi javobdagi next_cursor),
+    subject, class_level, q (test nomining bir qismi yoki 6 xonali ID).
+    """
     ensure_db()  # Database ni tekshirish
     
+    # Versiya so'rovdan oldin olinadi - javob hech qachon eskiroq versiya bilan belgilanmaydi
     try:
-        conn = safe_get_db()
+        version = storage.catalog_version()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tests ORDER BY created_at DESC')
-    tests = cursor.fetchall()
-    conn.close()
+    not_modified = catalog_not_modified(version)
+    if not_modified is not None:
+        return not_modified
+    
+    subject = request.args.get('subject')
+    class_level = request.args.get('class_level')
+    search = (request.args.get('q') or '').strip()[:SEARCH_MAX_LENGTH] or None
+    cursor_param = request.args.get('cursor')
+    try:
+        limit = parse_limit(TESTS_PAGE_DEFAULT, TESTS_PAGE_MAX)
+        after = decode_cursor(cursor_param, 2) if cursor_param else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # O'chirilgan (hali tozalanmagan) testlar ko'rsatilmaydi
+    try:
+        tests = storage.list_tests(class_level, subject, after, limit + 1, search=search)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    # Bitta ortiqcha qator - keyingi sahifa borligini bilish uchun
+    has_more = len(tests) > limit
+    tests = tests[:limit]
     
     tests_list = []
     for test in tests:
-        keys = test.keys()
         tests_list.append({
             'id': test['id'],
             'name': test['name'],
-            'image': test['image'] if 'image' in keys else None,
-            'class_level': test['class_level'] if 'class_level' in keys else None,
-            'duration_minutes': test['duration_minutes'] if 'duration_minutes' in keys else None,
-            'subject': test['subject'] if 'subject' in keys else None,
+            'image': image_url(test['id'], test['image_hash'], test['image']),
+            'image_hash': test['image_hash'],
+            'class_level': test['class_level'],
+            'duration_minutes': test['duration_minutes'],
+            'subject': test['subject'],
             'created_at': test['created_at']
         })
-    return jsonify({'tests': tests_list})
+    
+    next_cursor = None
+    if has_more:
+        last = tests[-1]
+        next_cursor = encode_cursor(last['created_at'], last['id'])
+    return set_catalog_headers(
+        jsonify({'tests': tests_list, 'next_cursor': next_cursor}), version
+    )
 
 @app.route('/api/tests/<test_id>', methods=['GET'])
 def get_test(test_id):
     """Bitta testni barcha savollari bilan olish"""
+    ensure_db()  # Database ni tekshirish
     try:
-        conn = safe_get_db()
+        version = storage.catalog_version()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    cursor = conn.cursor()
-    
-    # Testni topish
-    cursor.execute('SELECT * FROM tests WHERE id = ?', (test_id,))
-    test = cursor.fetchone()
-    if not test:
-        conn.close()
-        return jsonify({'error': 'Test topilmadi'}), 404
+    not_modified = catalog_not_modified(version)
+    if not_modified is not None:
+        return not_modified
     
-    # Savollarni olish
-    cursor.execute('SELECT * FROM questions WHERE test_id = ?', (test_id,))
-    questions = cursor.fetchall()
+    # Test yaratilgandan keyin o'zgarmaydi - katalog versiyasi bir xil bo'lsa keshdan
+    etag = version[0] if version is not None else None
+    cached = _test_cache.get(test_id)
+    if cached is not None and cached[0] == etag:
+        return set_catalog_headers(jsonify({'test': cached[1]}), version)
     
-    questions_list = []
-    for q in questions:
-        # Javob variantlarini olish
-        cursor.execute('SELECT * FROM answers WHERE question_id = ?', (q['id'],))
-        answers = cursor.fetchall()
-        
-        answers_list = []
-        for ans in answers:
-            answers_list.append({
-                'id': ans['id'],
-                'variant': ans['variant'],
-                'text': ans['text']
-            })
-        
-        questions_list.append({
-            'id': q['id'],
-            'question_text': q['question_text'],
-            'answers': answers_list
-        })
+    try:
+        test = storage.get_test(test_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
     
-    conn.close()
+    if test is None:
+        return jsonify({'error': 'Test topilmadi'}), 404
     
-    keys = test.keys()
-    return jsonify({
-        'test': {
-            'id': test['id'],
-            'name': test['name'],
-            'class_level': test['class_level'] if 'class_level' in keys else None,
-            'duration_minutes': test['duration_minutes'] if 'duration_minutes' in keys else None,
-            'subject': test['subject'] if 'subject' in keys else None,
-            'image': test['image'] if 'image' in keys else None,
-            'questions': questions_list
-        }
-    })
+    test_payload = dict(test, image=image_url(test['id'], test['image_hash'], test['image']))
+    _test_cache.set(test_id, (etag, test_payload))
+    return set_catalog_headers(jsonify({'test': test_payload}), version)
+
+def parse_duration(duration_minutes):
+    """Test vaqtini tekshirish, noto'g'ri bo'lsa ValueError"""
+    if duration_minutes is None:
+        return None
+    try:
+        duration_minutes = int(duration_minutes)
+    except (TypeError, ValueError):
+        raise ValueError('Test vaqti son bo\'lishi kerak')
+    if duration_minutes < 1:
+        raise ValueError('Test vaqti kamida 1 daqiqa bo\'lishi kerak')
+    return duration_minutes
 
 @app.route('/api/tests/create', methods=['POST'])
 def create_test():
@@ -181,7 +274,7 @@ def create_test():
     data = request.json or {}
     test_name = data.get('name')
     questions = data.get('questions', [])
-    test_image = data.get('image')  # Rasm base64 formatida
+    test_image = data.get('image')  # Rasm base64 (data URL) yoki http(s) URL
     class_level = data.get('class_level')
     duration_minutes = data.get('duration_minutes')
     subject = data.get('subject')
@@ -192,69 +285,82 @@ def create_test():
     if not questions:
         return jsonify({'error': 'Kamida bitta savol bo\'lishi kerak'}), 400
 
-    if duration_minutes is not None:
+    try:
+        duration_minutes = parse_duration(duration_minutes)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Rasm va savol qatorlari tranzaksiyadan oldin tayyorlanadi
+    image = None
+    image_link = None
+    if is_image_url(test_image):
+        image_link = test_image  # Tashqi URL o'z holicha saqlanadi
+    elif test_image:
         try:
-            duration_minutes = int(duration_minutes)
-            if duration_minutes < 1:
-                return jsonify({'error': 'Test vaqti kamida 1 daqiqa bo\'lishi kerak'}), 400
-        except ValueError:
-            return jsonify({'error': 'Test vaqti son bo\'lishi kerak'}), 400
+            image = prepare_image(test_image)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    question_rows = [q for q in map(normalize_question, questions) if q]
     
-    # Test ID yaratish
-    test_id = generate_test_id()
     try:
-        conn = safe_get_db()
+        test_id = storage.create_test(
+            test_name, class_level, duration_minutes, subject, question_rows, image,
+            image_url=image_link
+        )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    cursor = conn.cursor()
     
-    # ID takrorlanmasligini tekshirish
-    while True:
-        cursor.execute('SELECT id FROM tests WHERE id = ?', (test_id,))
-        if cursor.fetchone():
-            test_id = generate_test_id()
-        else:
-            break
-    
-    # Test yaratish (rasm bilan yoki rasm siz)
-    cursor.execute(
-        '''
-        INSERT INTO tests (id, name, image, class_level, duration_minutes, subject)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ''',
-        (test_id, test_name, test_image, class_level, duration_minutes, subject)
-    )
+    return jsonify({
+        'success': True,
+        'test_id': test_id,
+        'message': 'Test muvaffaqiyatli yaratildi'
+    })
+
+@app.route('/api/tests/import', methods=['POST'])
+def import_test():
+    """Katta savollar bankini oqim ko'rinishida import qilish
+
+    Test ma'lumotlari query parametrlarda: name, class_level, subject,
+    duration_minutes. Tana: text/csv, application/x-ndjson yoki
+    application/json (savollar massivi).
+    """
+    test_name = request.args.get('name')
+    class_level = request.args.get('class_level')
+    subject = request.args.get('subject')
     
-    # Savollar va javoblar yaratish
-    for q_data in questions:
-        question_text = q_data.get('question_text')
-        answers = q_data.get('answers', [])
-        correct_answer = q_data.get('correct_answer', 'A')
-        
-        if not question_text or not answers:
-            continue
-        
-        # Savol yaratish
-        cursor.execute(
-            'INSERT INTO questions (test_id, question_text, correct_answer) VALUES (?, ?, ?)',
-            (test_id, question_text, correct_answer)
-        )
-        question_id = cursor.lastrowid
-        
-        # Javob variantlarini yaratish
-        for ans_data in answers:
-            cursor.execute(
-                'INSERT INTO answers (question_id, variant, text) VALUES (?, ?, ?)',
-                (question_id, ans_data.get('variant'), ans_data.get('text'))
-            )
+    if not test_name:
+        return jsonify({'error': 'Test nomi kiritilishi shart'}), 400
+    try:
+        duration_minutes = parse_duration(request.args.get('duration_minutes') or None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Tana request.stream dan o'qiladi - to'liq xotiraga yuklanmaydi.
+    # Yozish uchun faqat tayyor qatorlar saqlanadi.
+    question_rows = []
+    try:
+        for question in iter_questions(request.stream, request.content_type):
+            question_rows.append(question)
+            if len(question_rows) > IMPORT_MAX_QUESTIONS:
+                return jsonify({
+                    'error': f'Savollar soni {IMPORT_MAX_QUESTIONS} tadan oshmasligi kerak'
+                }), 400
+    except QuestionImportError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not question_rows:
+        return jsonify({'error': 'Kamida bitta savol bo\'lishi kerak'}), 400
     
-    conn.commit()
-    conn.close()
+    try:
+        test_id = storage.create_test(test_name, class_level, duration_minutes, subject, question_rows)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
     
     return jsonify({
         'success': True,
         'test_id': test_id,
-        'message': 'Test muvaffaqiyatli yaratildi'
+        'questions': len(question_rows),
+        'message': 'Test muvaffaqiyatli import qilindi'
     })
 
 @app.route('/api/tests/<test_id>/delete', methods=['DELETE'])
@@ -267,46 +373,87 @@ def delete_test(test_id):
     if delete_code != '2025':
         return jsonify({'error': 'Noto\'g\'ri kod'}), 403
     
+    # Test darhol yashiriladi (SQLite: savollar va natijalar fonda bo'laklab tozalanadi)
     try:
-        conn = safe_get_db()
+        deleted = storage.delete_test(test_id)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    cursor = conn.cursor()
-    
-    # Testni topish
-    cursor.execute('SELECT * FROM tests WHERE id = ?', (test_id,))
-    test = cursor.fetchone()
-    if not test:
-        conn.close()
+    if not deleted:
         return jsonify({'error': 'Test topilmadi'}), 404
-    
-    # Barcha savollarni olish
-    cursor.execute('SELECT id FROM questions WHERE test_id = ?', (test_id,))
-    question_ids = [row['id'] for row in cursor.fetchall()]
-    
-    # Barcha javoblarni o'chirish
-    for question_id in question_ids:
-        cursor.execute('DELETE FROM answers WHERE question_id = ?', (question_id,))
-    
-    # Barcha savollarni o'chirish
-    cursor.execute('DELETE FROM questions WHERE test_id = ?', (test_id,))
-    
-    # Barcha natijalarni o'chirish
-    cursor.execute('DELETE FROM test_results WHERE test_id = ?', (test_id,))
-    
-    # Testni o'chirish
-    cursor.execute('DELETE FROM tests WHERE id = ?', (test_id,))
-    
-    conn.commit()
-    conn.close()
+    _test_cache.pop(test_id)
+    invalidate_answer_key(test_id)
     
     return jsonify({
         'success': True,
         'message': 'Test muvaffaqiyatli o\'chirildi'
     })
 
+@app.route('/api/tests/<test_id>/stats', methods=['GET'])
+def get_test_stats(test_id):
+    """Test statistikasi: ishlaganlar soni, o'rtacha foiz va histogramma"""
+    try:
+        row = storage.test_stats(test_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if not row:
+        return jsonify({'error': 'Test topilmadi'}), 404
+    
+    return jsonify({
+        'test_id': test_id,
+        'test_name': row['name'],
+        'stats': read_test_stats(row)
+    })
+
+@app.route('/api/tests/<test_id>/image', methods=['GET'])
+def get_test_image(test_id):
+    """Test rasmini olish (ETag va uzoq muddatli kesh bilan)"""
+    try:
+        image = storage.test_image(test_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if not image:
+        return jsonify({'error': 'Rasm topilmadi'}), 404
+    
+    # Rasm kontent hash'i bo'yicha saqlanadi - hech qachon o'zgarmaydi
+    response = make_response(image['data'])
+    response.headers['Content-Type'] = image['mime_type']
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.set_etag(image['hash'])
+    return response.make_conditional(request)
+
 # ============ TEST TAKING ENDPOINTS ============
 
+def score_submission(test_id, answers):
+    """Javoblarni baholash (Score), test topilmasa None
+
+    Flask va ASGI (asgi.py) submit yo'llari uchun umumiy.
+    """
+    # Kompilyatsiya qilingan kalit (SQLite da keshda saqlanadi)
+    answer_key = storage.answer_key(test_id)
+    if answer_key is None:
+        return None
+    return answer_key.score(to_answer_map(answers))
+
+def submission_payload(result_id, created, score):
+    """Saqlangan natija uchun (javob, status kodi)"""
+    if not created:
+        return {
+            'error': 'Bu test allaqachon ishlangan',
+            'result_id': result_id
+        }, 400
+    correct_answers, total_questions, score = score
+    return {
+        'success': True,
+        'result': {
+            'id': result_id,
+            'score': round(score, 2),
+            'correct_answers': correct_answers,
+            'total_questions': total_questions
+        }
+    }, 200
+
 @app.route('/api/tests/<test_id>/submit', methods=['POST'])
 def submit_test(test_id):
     """Test javoblarini yuborish va natijani hisoblash"""
@@ -316,187 +463,263 @@ def submit_test(test_id):
     
     if not user_id:
         return jsonify({'error': 'User ID kiritilishi shart'}), 400
+    user_id = str(user_id)  # login bilan bir xil - raqamli ID ham satr sifatida saqlanadi
     
     try:
-        conn = safe_get_db()
+        score = score_submission(test_id, answers)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    cursor = conn.cursor()
-    
-    # Testni topish
-    cursor.execute('SELECT * FROM tests WHERE id = ?', (test_id,))
-    test = cursor.fetchone()
-    if not test:
-        conn.close()
+    if score is None:
         return jsonify({'error': 'Test topilmadi'}), 404
     
-    # Testni oldin ishlanganligini tekshirish
-    cursor.execute(
-        'SELECT * FROM test_results WHERE test_id = ? AND user_id = ?',
-        (test_id, user_id)
-    )
-    existing_result = cursor.fetchone()
-    
-    if existing_result:
-        conn.close()
-        return jsonify({
-            'error': 'Bu test allaqachon ishlangan',
-            'result_id': existing_result['id']
-        }), 400
-    
-    # Natijalarni hisoblash
-    cursor.execute('SELECT * FROM questions WHERE test_id = ?', (test_id,))
-    questions = cursor.fetchall()
-    
-    total_questions = len(questions)
-    correct_answers = 0
-    
-    for q in questions:
-        user_answer = next(
-            (a['answer'] for a in answers if a['question_id'] == q['id']),
-            None
+    # Test oldin ishlangan bo'lsa, yangi natija yozilmaydi (created=False)
+    try:
+        result_id, created = storage.add_result(
+            test_id, user_id, score.score, score.correct_answers, score.total_questions
         )
-        if user_answer and user_answer.upper() == q['correct_answer'].upper():
-            correct_answers += 1
-    
-    score = (correct_answers / total_questions * 100) if total_questions > 0 else 0
-    
-    # Natijani saqlash
-    cursor.execute(
-        '''INSERT INTO test_results (test_id, user_id, score, correct_answers, total_questions)
-           VALUES (?, ?, ?, ?, ?)''',
-        (test_id, user_id, score, correct_answers, total_questions)
-    )
-    result_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    
-    return jsonify({
-        'success': True,
-        'result': {
-            'id': result_id,
-            'score': round(score, 2),
-            'correct_answers': correct_answers,
-            'total_questions': total_questions
-        }
-    })
+    except LookupError:
+        # Test baholangandan keyin o'chirilgan
+        return jsonify({'error': 'Test topilmadi'}), 404
+    payload, status = submission_payload(result_id, created, score)
+    return jsonify(payload), status
 
 # ============ RESULTS ENDPOINTS ============
 
 @app.route('/api/results/<test_id>', methods=['GET'])
 def get_test_results(test_id):
-    """Test natijalarini olish"""
+    """Test natijalarini sahifalab olish
+
+    Query parametrlar: limit, cursor (oldingi javobdagi next_cursor),
+    sort (completed_at - yangilari birinchi, yoki score - reyting tartibida),
+    fields (vergul bilan ajratilgan maydonlar ro'yxati).
+    """
+    sort = request.args.get('sort', 'completed_at')
+    if sort not in ('completed_at', 'score'):
+        return jsonify({'error': 'sort faqat completed_at yoki score bo\'lishi mumkin'}), 400
+    
+    fields = RESULT_FIELDS
+    if request.args.get('fields'):
+        fields = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in RESULT_FIELDS]
+        if unknown:
+            return jsonify({'error': f"Noma'lum maydonlar: {', '.join(unknown)}"}), 400
+    
     try:
-        conn = safe_get_db()
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    cursor = conn.cursor()
+        limit = parse_limit(RESULTS_PAGE_DEFAULT, RESULTS_PAGE_MAX)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Testni topish
-    cursor.execute('SELECT * FROM tests WHERE id = ?', (test_id,))
-    test = cursor.fetchone()
-    if not test:
-        conn.close()
-        return jsonify({'error': 'Test topilmadi'}), 404
+    cursor_param = request.args.get('cursor')
+    after = None
+    if cursor_param:
+        try:
+            after = decode_cursor(cursor_param, 2 if sort == 'completed_at' else 4)
+            after[-1] = int(after[-1])
+            if sort == 'score':
+                after[0] = float(after[0])
+                after[1] = int(after[1])
+        except ValueError:
+            return jsonify({'error': 'Cursor noto\'g\'ri'}), 400
     
-    # Natijalarni olish
-    cursor.execute(
-        'SELECT * FROM test_results WHERE test_id = ? ORDER BY completed_at DESC',
-        (test_id,)
-    )
-    results = cursor.fetchall()
+    try:
+        test = storage.test_info(test_id)
+        if not test:
+            return jsonify({'error': 'Test topilmadi'}), 404
+        
+        # Keyset pagination: har bir sahifa indeksdagi oraliqdan o'qiladi
+        results = storage.test_results(test_id, sort, after, limit + 1)
+        
+        has_more = len(results) > limit
+        results = results[:limit]
+        
+        # Foydalanuvchi ismlari keshdan (yo'qlari bitta so'rov bilan)
+        names = storage.user_names([r['user_id'] for r in results]) if 'user_name' in fields else {}
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
     
     results_list = []
     for result in results:
-        # Foydalanuvchi ma'lumotlarini olish
-        cursor.execute('SELECT * FROM users WHERE id = ?', (result['user_id'],))
-        user = cursor.fetchone()
-        
-        results_list.append({
+        row = {
             'id': result['id'],
-            'user_name': user['name'] if user else 'Noma\'lum',
+            'user_name': names.get(result['user_id'], 'Noma\'lum'),
             'user_id': result['user_id'],
             'score': round(result['score'], 2),
             'correct_answers': result['correct_answers'],
             'total_questions': result['total_questions'],
             'completed_at': result['completed_at']
-        })
+        }
+        results_list.append({field: row[field] for field in fields})
     
-    conn.close()
+    next_cursor = None
+    if has_more:
+        last = results[-1]
+        if sort == 'completed_at':
+            next_cursor = encode_cursor(last['completed_at'], last['id'])
+        else:
+            next_cursor = encode_cursor(
+                repr(last['score']), last['correct_answers'], last['completed_at'], last['id']
+            )
     
-    keys = test.keys()
     return jsonify({
         'test_name': test['name'],
-        'class_level': test['class_level'] if 'class_level' in keys else None,
-        'duration_minutes': test['duration_minutes'] if 'duration_minutes' in keys else None,
-        'results': results_list
+        'class_level': test['class_level'],
+        'duration_minutes': test['duration_minutes'],
+        'results': results_list,
+        'next_cursor': next_cursor
     })
 
 @app.route('/api/results/user/<user_id>', methods=['GET'])
 def get_user_results(user_id):
-    """Foydalanuvchining barcha test natijalarini olish"""
+    """Foydalanuvchining test natijalarini sahifalab olish (limit, cursor)"""
+    try:
+        limit = parse_limit(USER_RESULTS_PAGE_DEFAULT, USER_RESULTS_PAGE_MAX)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    cursor_param = request.args.get('cursor')
+    after = None
+    if cursor_param:
+        try:
+            completed_at, result_id = decode_cursor(cursor_param, 2)
+            after = (completed_at, int(result_id))
+        except ValueError:
+            return jsonify({'error': 'Cursor noto\'g\'ri'}), 400
+    
     try:
-        conn = safe_get_db()
+        results = storage.user_results(user_id, after, limit + 1)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    cursor = conn.cursor()
     
-    cursor.execute(
-        'SELECT * FROM test_results WHERE user_id = ? ORDER BY completed_at DESC',
-        (user_id,)
-    )
-    results = cursor.fetchall()
+    has_more = len(results) > limit
+    results = results[:limit]
     
     results_list = []
     for result in results:
-        cursor.execute('SELECT * FROM tests WHERE id = ?', (result['test_id'],))
-        test = cursor.fetchone()
-        
         results_list.append({
             'id': result['id'],
             'test_id': result['test_id'],
-            'test_name': test['name'] if test else 'Noma\'lum test',
+            'test_name': result['test_name'] or 'Noma\'lum test',
             'score': round(result['score'], 2),
             'correct_answers': result['correct_answers'],
             'total_questions': result['total_questions'],
             'completed_at': result['completed_at']
         })
     
-    conn.close()
+    next_cursor = None
+    if has_more:
+        last = results[-1]
+        next_cursor = encode_cursor(last['completed_at'], last['id'])
+    
+    return jsonify({'results': results_list, 'next_cursor': next_cursor})
+
+@app.route('/api/results/user/<user_id>/test/<test_id>', methods=['GET'])
+def get_user_test_result(user_id, test_id):
+    """Foydalanuvchi shu testni ishlaganmi - UNIQUE(test_id, user_id) indeksi orqali"""
+    try:
+        result = storage.user_test_result(test_id, user_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    if not result:
+        return jsonify({'taken': False, 'result': None})
     
-    return jsonify({'results': results_list})
+    return jsonify({
+        'taken': True,
+        'result': {
+            'id': result['id'],
+            'test_id': test_id,
+            'user_id': user_id,
+            'score': round(result['score'], 2),
+            'correct_answers': result['correct_answers'],
+            'total_questions': result['total_questions'],
+            'completed_at': result['completed_at']
+        }
+    })
 
 @app.route('/api/results/<result_id>', methods=['GET'])
 def get_result(result_id):
     """Bitta natijani olish"""
     try:
-        conn = safe_get_db()
+        result = storage.get_result(result_id)
+        if not result:
+            return jsonify({'error': 'Natija topilmadi'}), 404
+        names = storage.user_names([result['user_id']])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    cursor = conn.cursor()
     
-    cursor.execute('SELECT * FROM test_results WHERE id = ?', (result_id,))
-    result = cursor.fetchone()
-    
-    if not result:
-        conn.close()
-        return jsonify({'error': 'Natija topilmadi'}), 404
+    return jsonify({
+        'result': {
+            'id': result['id'],
+            'user_name': names.get(result['user_id'], 'Noma\'lum'),
+            'user_id': result['user_id'],
+            'test_name': result['test_name'] or 'Noma\'lum test',
+            'test_id': result['test_id'],
+            'score': round(result['score'], 2),
+            'correct_answers': result['correct_answers'],
+            'total_questions': result['total_questions'],
+            'completed_at': result['completed_at']
+        }
+    })
+
+@app.route('/api/results/<test_id>/leaderboard', methods=['GET'])
+def get_leaderboard(test_id):
+    """Test reytingining eng yaxshi N ta natijasi (?limit=N)"""
+    try:
+        limit = parse_limit(LEADERBOARD_DEFAULT, LEADERBOARD_MAX)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    cursor.execute('SELECT * FROM users WHERE id = ?', (result['user_id'],))
-    user = cursor.fetchone()
+    try:
+        test = storage.test_info(test_id)
+        if not test:
+            return jsonify({'error': 'Test topilmadi'}), 404
+        
+        # Reyting tartibida eng yaxshi limit ta natija va umumiy soni
+        rows, total = storage.leaderboard(test_id, limit)
+        names = storage.user_names([row['user_id'] for row in rows])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
     
-    cursor.execute('SELECT * FROM tests WHERE id = ?', (result['test_id'],))
-    test = cursor.fetchone()
+    leaderboard = []
+    for rank, row in enumerate(rows, start=1):
+        leaderboard.append({
+            'rank': rank,
+            'id': row['id'],
+            'user_id': row['user_id'],
+            'user_name': names.get(row['user_id'], 'Noma\'lum'),
+            'score': round(row['score'], 2),
+            'correct_answers': row['correct_answers'],
+            'total_questions': row['total_questions'],
+            'completed_at': row['completed_at']
+        })
     
-    conn.close()
+    return jsonify({
+        'test_name': test['name'],
+        'class_level': test['class_level'],
+        'duration_minutes': test['duration_minutes'],
+        'total': total,
+        'leaderboard': leaderboard
+    })
+
+@app.route('/api/results/<test_id>/rank/<user_id>', methods=['GET'])
+def get_user_rank(test_id, user_id):
+    """Foydalanuvchining test reytingidagi o'rni"""
+    try:
+        ranked = storage.user_rank(test_id, user_id)
+        if ranked is None:
+            return jsonify({'error': 'Natija topilmadi'}), 404
+        result, rank, total = ranked
+        names = storage.user_names([user_id])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
     
     return jsonify({
+        'rank': rank,
+        'total': total,
         'result': {
             'id': result['id'],
-            'user_name': user['name'] if user else 'Noma\'lum',
-            'user_id': result['user_id'],
-            'test_name': test['name'] if test else 'Noma\'lum test',
-            'test_id': result['test_id'],
+            'user_id': user_id,
+            'user_name': names.get(user_id, 'Noma\'lum'),
             'score': round(result['score'], 2),
             'correct_answers': result['correct_answers'],
             'total_questions': result['total_questions'],
@@ -506,40 +729,44 @@ def get_result(result_id):
 
 # ============ HTML PAGES ============
 
+def page(template_name):
+    """Sahifani bir marta render qilib, siqilgan holda berish (debug da har safar)"""
+    return render_page(render_template, template_name, cache=not app.debug)
+
 @app.route('/')
 def index():
     """Asosiy sahifa"""
-    return render_template('Index.html')
+    return page('Index.html')
 
 @app.route('/Index.html')
 def index_html():
     """Asosiy sahifa (alternativ URL)"""
-    return render_template('Index.html')
+    return page('Index.html')
 
 @app.route('/kirish.html')
 def kirish():
     """Kirish sahifasi"""
-    return render_template('kirish.html')
+    return page('kirish.html')
 
 @app.route('/test_tanlov.html')
 def test_tanlov():
     """Test tanlash sahifasi"""
-    return render_template('test_tanlov.html')
+    return page('test_tanlov.html')
 
 @app.route('/test_yuklash.html')
 def test_yuklash():
     """Test yuklash sahifasi"""
-    return render_template('test_yuklash.html')
+    return page('test_yuklash.html')
 
 @app.route('/results.html')
 def results():
     """Natijalar sahifasi"""
-    return render_template('results.html')
+    return page('results.html')
 
 @app.route('/ishlash.html')
 def ishlash():
     """Test ishlash sahifasi"""
-    return render_template('ishlash.html')
+    return page('ishlash.html')
 
 # Root route for health check
 @app.route('/api/health', methods=['GET'])
@@ -553,9 +780,20 @@ def health():
             'create_test': '/api/tests/create',
             'submit_test': '/api/tests/<test_id>/submit',
             'results': '/api/results/<test_id>'
-        }
+        },
+        **storage.stats(),
+        'test_cache': _test_cache.stats(),
+        'answer_key_cache': answer_key_cache_stats()
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus formatidagi metrikalar"""
+    response = make_response(render_prometheus())
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 # API root route
 @app.route('/api', methods=['GET'])
 def api_root():
@@ -576,6 +814,10 @@ def api_root():
 def not_found(error):
     return jsonify({'error': 'Endpoint topilmadi'}), 404
 
+@app.errorhandler(413)
+def too_large(error):
+    return jsonify({'error': 'So\'rov hajmi juda katta'}), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Server xatoligi'}), 500
@@ -592,5 +834,7 @@ if __name__ == '__main__':
     print("URL: http://localhost:5000")
     print("API Base URL: http://localhost:5000/api")
     print("=" * 50)
+    if SQL_TRACE == '0':
+        init_sql_trace(app, verbose=True)  # Debug rejimida so'rov boshiga SQL hisoboti
     app.run(debug=True, host='0.0.0.0', port=5000)
 
@@ -0,0 +1,255 @@
+"""ASGI kirish nuqtasi - imtihon paytida ko'p bir vaqtdagi o'quvchilar uchun
+
+Ishga tushirish:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Ulanishlar event loop da ushlab turiladi, thread faqat database ishi
+uchun band qilinadi (ASGI_DB_THREADS ta thread'li alohida pool). Shuning
+uchun minglab kutayotgan ulanishlar worker thread'larini egallamaydi.
+
+- POST /api/tests/<id>/submit to'liq async: baholash DB pool da,
+  natija yozilishi storage.add_result_async orqali kutiladi (SQLite:
+  result_writer.submit_async, memory: darhol).
+- Qolgan endpoint'lar (get_test, login, natijalar va h.k.) app_simple
+  dagi Flask handler'lari bilan DB pool ichida bajariladi - so'rov tanasi
+  BODY_BUFFER_SIZE gacha oldindan async o'qiladi, sxema va so'rovlar bir
+  xil (models_simple). Kattaroq tana (masalan /api/tests/import) xotiraga
+  yig'ilmaydi: wsgi.input uni Flask o'qigan sari receive() dan oladi.
+"""
+import asyncio
+import io
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from werkzeug.exceptions import ClientDisconnected, RequestEntityTooLarge, RequestTimeout
+
+import app_simple
+import metrics
+
+DB_THREADS = int(os.environ.get('ASGI_DB_THREADS', 16))
+MAX_BODY_SIZE = int(os.environ.get('ASGI_MAX_BODY_SIZE', 32 * 1024 * 1024))
+BODY_BUFFER_SIZE = int(os.environ.get('ASGI_BODY_BUFFER_SIZE', 64 * 1024))
+SUBMIT_MAX_BODY_SIZE = int(os.environ.get('ASGI_SUBMIT_MAX_BODY_SIZE', 1024 * 1024))
+BODY_READ_TIMEOUT = float(os.environ.get('ASGI_BODY_READ_TIMEOUT', 60))
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix='db')
+_submit_path = re.compile(r'^/api/tests/([^/]+)/submit$')
+
+class ReceiveStream(io.RawIOBase):
+    """ASGI tanasining qolgan qismi - wsgi.input sifatida (DB pool thread'ida o'qiladi)
+
+    Har bir read receive() ni event loop da chaqiradi, shuning uchun xotirada
+    bir vaqtda faqat bitta bo'lak turadi. Jami MAX_BODY_SIZE dan oshsa 413.
+    """
+
+    def __init__(self, prefix, receive, loop):
+        self._buffer = prefix
+        self._receive = receive
+        self._loop = loop
+        self._more = True
+        self._size = len(prefix)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer and self._more:
+            future = asyncio.run_coroutine_threadsafe(self._receive(), self._loop)
+            try:
+                message = future.result(BODY_READ_TIMEOUT)
+            except FutureTimeoutError:  # 3.11 gacha builtin TimeoutError emas
+                future.cancel()
+                raise RequestTimeout()
+            if message['type'] == 'http.disconnect':
+                raise ClientDisconnected()
+            self._buffer = message.get('body', b'')
+            self._more = message.get('more_body', False)
+            self._size += len(self._buffer)
+            if self._size > MAX_BODY_SIZE:
+                raise RequestEntityTooLarge()
+        count = min(len(buffer), len(self._buffer))
+        buffer[:count] = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        return count
+
+def build_environ(scope, body, stream=None):
+    """ASGI scope dan WSGI environ yaratish (stream - tananing o'qilmagan qismi)"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BufferedReader(stream) if stream is not None else io.BytesIO(body),
+        'wsgi.input_terminated': True,  # Tana oxiri receive() da ma'lum (chunked ham)
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            key = name
+        else:
+            key = 'HTTP_' + name
+        if key in environ:
+            value = environ[key] + ',' + value
+        environ[key] = value
+    return environ
+
+def call_flask(environ):
+    """Flask app ni (DB pool thread'ida) chaqirib, to'liq javobni qaytarish"""
+    response = {}
+    chunks = []
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = headers
+        return chunks.append
+
+    result = app_simple.app(environ, start_response)
+    try:
+        for chunk in result:
+            chunks.append(chunk)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()  # teardown - connection pool'ga qaytadi
+    return response['status'], response['headers'], b''.join(chunks)
+
+async def read_body(receive, limit):
+    """Tanani limit baytgacha o'qish: (body, more_body), mijoz uzilsa None
+
+    more_body=True bo'lsa, tana limit dan katta va qolgan qismi hali
+    receive() da.
+    """
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body.extend(message.get('body', b''))
+        if not message.get('more_body'):
+            return bytes(body), False
+        if len(body) >= limit:
+            return bytes(body), True
+
+async def send_response(send, status, headers, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (name.encode('latin-1'), value.encode('latin-1')) for name, value in headers
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def send_json(send, payload, status=200):
+    body = json.dumps(payload).encode('utf-8')
+    await send_response(send, status, [
+        ('Content-Type', 'application/json'),
+        ('Content-Length', str(len(body))),
+        ('Access-Control-Allow-Origin', '*'),
+    ], body)
+
+async def submit_test(send, test_id, body):
+    """POST /api/tests/<id>/submit - app_simple.submit_test ning async varianti
+
+    Javob status kodini qaytaradi (metrikalar uchun).
+    """
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        await send_json(send, {'error': 'JSON noto\'g\'ri'}, 400)
+        return 400
+    data = data if isinstance(data, dict) else {}
+    user_id = data.get('user_id')
+    answers = data.get('answers', [])
+
+    if not user_id:
+        await send_json(send, {'error': 'User ID kiritilishi shart'}, 400)
+        return 400
+    user_id = str(user_id)  # login bilan bir xil - raqamli ID ham satr sifatida saqlanadi
+
+    loop = asyncio.get_running_loop()
+    try:
+        score = await loop.run_in_executor(
+            _db_executor, app_simple.score_submission, test_id, answers
+        )
+    except Exception as e:
+        await send_json(send, {'error': str(e)}, 500)
+        return 500
+    if score is None:
+        await send_json(send, {'error': 'Test topilmadi'}, 404)
+        return 404
+
+    try:
+        result_id, created = await app_simple.storage.add_result_async(
+            test_id, user_id, score.score, score.correct_answers, score.total_questions,
+            executor=_db_executor
+        )
+    except LookupError:
+        await send_json(send, {'error': 'Test topilmadi'}, 404)
+        return 404
+    except Exception as e:
+        await send_json(send, {'error': str(e)}, 500)
+        return 500
+    payload, status = app_simple.submission_payload(result_id, created, score)
+    await send_json(send, payload, status)
+    return status
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await asyncio.get_running_loop().run_in_executor(_db_executor, app_simple.ensure_db)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            _db_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    match = _submit_path.match(scope['path'])
+    submit = match is not None and scope['method'] == 'POST'
+    received = await read_body(receive, SUBMIT_MAX_BODY_SIZE if submit else BODY_BUFFER_SIZE)
+    if received is None:
+        return  # Mijoz ulanishni uzdi
+    body, more_body = received
+
+    if submit:
+        if more_body:
+            await send_json(send, {'error': 'So\'rov hajmi juda katta'}, 413)
+            return
+        start = time.perf_counter()
+        status = await submit_test(send, match.group(1), body)
+        metrics.record_request(
+            '/api/tests/<test_id>/submit', 'POST', status, time.perf_counter() - start
+        )
+        return
+
+    loop = asyncio.get_running_loop()
+    stream = ReceiveStream(body, receive, loop) if more_body else None
+    environ = build_environ(scope, body, stream)
+    status, headers, response_body = await loop.run_in_executor(
+        _db_executor, call_flask, environ
+    )
+    await send_response(send, status, headers, response_body)
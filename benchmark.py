@@ -0,0 +1,270 @@
+"""Imtihon kuni yuklamasini o'lchash (benchmark)
+
+Vaqtinchalik database yaratadi, bitta test qo'shadi va imtihon trafigini
+takrorlaydi:
+    1. login      - barcha o'quvchilar bir vaqtda kiradi
+    2. get_test   - hammasi bitta testni ochadi
+    3. submit     - muddat tugaganda hammasi bir vaqtda topshiradi
+    4. results    - natijalar sahifasi (leaderboard + o'rin)
+
+Har bir bosqich uchun throughput va p50/p90/p99 kechikish chiqariladi va
+JSON faylga saqlanadi. Ikki natijani solishtirish: --compare eski.json
+
+Ishlatish:
+    python benchmark.py --students 500 --concurrency 100
+    python benchmark.py --url http://localhost:5000 --students 200
+    python benchmark.py --compare benchmark_results/oldingi.json
+    python benchmark.py --storage memory       # disk I/O siz asos
+    python benchmark.py --storage sqlalchemy   # models.py ORM qatlami
+
+Katta database ustida o'lchash: avval python seed_data.py --db katta.db,
+so'ng python benchmark.py --db katta.db
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+RESULTS_DIR = 'benchmark_results'
+
+class InProcessClient:
+    """Flask test client orqali so'rov (tarmoqsiz - faqat app narxi)"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+class HttpClient:
+    """Ishlab turgan serverga HTTP orqali so'rov"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = urllib.request.Request(
+            self.base_url + path, data=data, method=method,
+            headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                return response.status, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_phase(client, requests, concurrency):
+    """So'rovlar ro'yxatini bir vaqtda yuborish, statistikani qaytarish
+
+    requests: [(method, path, body), ...]. Barcha thread'lar tayyor
+    bo'lgach birga boshlanadi (imtihon "qo'ng'irog'i").
+    """
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    barrier = threading.Barrier(min(concurrency, len(requests)) or 1)
+
+    def worker(chunk):
+        barrier.wait()
+        for method, path, body in chunk:
+            start = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, body)
+            except Exception:
+                status = 'error'
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    workers = min(concurrency, len(requests)) or 1
+    chunks = [requests[i::workers] for i in range(workers)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(worker, chunks))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        'requests': len(requests),
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(len(requests) / wall, 1) if wall > 0 else None,
+        'p50_ms': ms(percentile(latencies, 0.50)),
+        'p90_ms': ms(percentile(latencies, 0.90)),
+        'p99_ms': ms(percentile(latencies, 0.99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+        'statuses': {str(k): v for k, v in sorted(statuses.items(), key=str)},
+    }
+
+def make_test_payload(questions, rng):
+    return {
+        'name': 'Benchmark testi',
+        'class_level': '9-sinf',
+        'subject': 'Matematika',
+        'duration_minutes': 45,
+        'questions': [
+            {
+                'question_text': f'{i + 1}-savol: {rng.randint(2, 99)} x {rng.randint(2, 99)} = ?',
+                'correct_answer': rng.choice('ABCD'),
+                'answers': [
+                    {'variant': v, 'text': str(rng.randint(100, 9999))} for v in 'ABCD'
+                ],
+            }
+            for i in range(questions)
+        ],
+    }
+
+def run_benchmark(client, students, concurrency, questions, seed):
+    rng = random.Random(seed)
+    phases = {}
+
+    status, data = client.request('POST', '/api/tests/create', make_test_payload(questions, rng))
+    if status != 200:
+        raise SystemExit(f'Test yaratib bo\'lmadi: {status} {data}')
+    test_id = data['test_id']
+    user_ids = [f'bench-{seed}-{i}' for i in range(students)]
+
+    phases['login'] = run_phase(client, [
+        ('POST', '/api/login', {'id': uid, 'name': f'O\'quvchi {i}'})
+        for i, uid in enumerate(user_ids)
+    ], concurrency)
+
+    phases['get_test'] = run_phase(client, [
+        ('GET', f'/api/tests/{test_id}', None) for _ in user_ids
+    ], concurrency)
+
+    _, data = client.request('GET', f'/api/tests/{test_id}')
+    question_ids = [q['id'] for q in data['test']['questions']]
+    phases['submit'] = run_phase(client, [
+        ('POST', f'/api/tests/{test_id}/submit', {
+            'user_id': uid,
+            'answers': [
+                {'question_id': qid, 'answer': rng.choice('ABCD')} for qid in question_ids
+            ],
+        })
+        for uid in user_ids
+    ], concurrency)
+
+    # results.html: leaderboard va o'quvchining o'rni
+    results_requests = []
+    for uid in user_ids:
+        results_requests.append(('GET', f'/api/results/{test_id}/leaderboard?limit=100', None))
+        results_requests.append(('GET', f'/api/results/{test_id}/rank/{uid}', None))
+    phases['results'] = run_phase(client, results_requests, concurrency)
+    return test_id, phases
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_phases(phases):
+    header = ('bosqich', "so'rov", 'rps', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms')
+    print('{:10} {:>7} {:>9} {:>9} {:>9} {:>9} {:>9}  status'.format(*header))
+    for name, p in phases.items():
+        print(f"{name:10} {p['requests']:7d} {p['throughput_rps'] or 0:9.1f} {p['p50_ms']:9.2f} "
+              f"{p['p90_ms']:9.2f} {p['p99_ms']:9.2f} {p['max_ms']:9.2f}  {p['statuses']}")
+
+def print_comparison(old, new):
+    print(f"\nSolishtirish: {old.get('revision')} ({old.get('timestamp')}) -> "
+          f"{new.get('revision')} ({new.get('timestamp')})")
+    for name, p in new['phases'].items():
+        before = old.get('phases', {}).get(name)
+        if not before:
+            continue
+        parts = []
+        for key in ('throughput_rps', 'p50_ms', 'p99_ms'):
+            if before.get(key) and p.get(key):
+                parts.append(f"{key} {before[key]} -> {p[key]} ({p[key] / before[key]:.2f}x)")
+        print(f"  {name:10} " + ', '.join(parts))
+
+def main():
+    parser = argparse.ArgumentParser(description='Imtihon kuni yuklama benchmarki')
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--questions', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--url', help='Ishlab turgan server (berilmasa - Flask app shu jarayonda)')
+    parser.add_argument('--db', help='Database fayli (berilmasa - vaqtinchalik)')
+    parser.add_argument('--storage', choices=('sqlite', 'memory', 'sqlalchemy'), default='sqlite',
+                        help="Ombor (memory - disk I/O siz asos o'lchov)")
+    parser.add_argument('--output', help='JSON natija fayli (standart: benchmark_results/<vaqt>.json)')
+    parser.add_argument('--compare', help='Oldingi JSON natija bilan solishtirish')
+    args = parser.parse_args()
+
+    if args.url:
+        client = HttpClient(args.url)
+        db_name = None
+    else:
+        import models_simple
+        os.environ['STORAGE_BACKEND'] = args.storage
+        db_name = None
+        if args.storage != 'memory':
+            db_name = args.db or os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+            models_simple.DB_NAME = db_name
+        import app_simple
+        client = InProcessClient(app_simple.app)
+
+    print(f"O'quvchilar: {args.students}, parallel: {args.concurrency}, "
+          f"savollar: {args.questions}, maqsad: {args.url or db_name or args.storage}")
+    test_id, phases = run_benchmark(
+        client, args.students, args.concurrency, args.questions, args.seed
+    )
+
+    result = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'params': {
+            'students': args.students,
+            'concurrency': args.concurrency,
+            'questions': args.questions,
+            'seed': args.seed,
+            'target': args.url or 'in-process',
+            'storage': None if args.url else args.storage,
+        },
+        'test_id': test_id,
+        'phases': phases,
+    }
+    print_phases(phases)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json'
+    )
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"\nNatija saqlandi: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(json.load(f), result)
+
+if __name__ == '__main__':
+    main()
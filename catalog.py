@@ -0,0 +1,89 @@
+"""Katalog versiyasi - GET /api/tests va /api/tests/<id> uchun ETag
+
+create_test va delete_test versiyani o'sha tranzaksiyada oshiradi.
+Jarayon versiyani xotirada saqlaydi va uni database dan ko'pi bilan
+CATALOG_VERSION_TTL soniyada bir marta qayta o'qiydi (boshqa worker
+jarayonlaridagi o'zgarishlarni ko'rish uchun). Shuning uchun
+If-None-Match mos kelganda 304 database ga murojaat qilmasdan qaytadi.
+"""
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+
+import models_simple
+
+def create_catalog_version_table(cursor):
+    """Versiya hisoblagichi jadvalini yaratish"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            epoch TEXT NOT NULL,
+            updated_at INTEGER NOT NULL
+        )
+    ''')
+    # epoch - database almashtirilsa eski ETag lar mos kelmasligi uchun
+    cursor.execute(
+        '''INSERT OR IGNORE INTO catalog_version (name, version, epoch, updated_at)
+           VALUES ('tests', 0, ?, ?)''',
+        (secrets.token_hex(4), int(time.time()))
+    )
+
+def bump_catalog_version(cursor):
+    """Katalog o'zgarganini belgilash (chaqiruvchining tranzaksiyasi ichida)"""
+    cursor.execute(
+        "UPDATE catalog_version SET version = version + 1, updated_at = ? WHERE name = 'tests'",
+        (int(time.time()),)
+    )
+
+class CatalogVersion:
+    """Katalog versiyasining jarayon ichidagi nusxasi"""
+
+    def __init__(self, ttl=1.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._db_name = None
+        self._checked_at = 0.0
+
+    def _load(self):
+        conn = models_simple.get_db()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT version, epoch, updated_at FROM catalog_version WHERE name = 'tests'"
+            )
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return (
+            f"{row['epoch']}-{row['version']}",
+            datetime.fromtimestamp(row['updated_at'], tz=timezone.utc)
+        )
+
+    def current(self):
+        """(etag, last_modified) - TTL ichida database ga murojaat qilinmaydi"""
+        now = time.monotonic()
+        with self._lock:
+            if (self._value is not None and self._db_name == models_simple.DB_NAME
+                    and now - self._checked_at < self.ttl):
+                return self._value
+        value = self._load()
+        with self._lock:
+            self._value = value
+            self._db_name = models_simple.DB_NAME
+            self._checked_at = now
+        return value
+
+    def invalidate(self):
+        """Shu jarayonda katalog o'zgardi - keyingi so'rov versiyani qayta o'qiydi"""
+        with self._lock:
+            self._value = None
+
+catalog_version = CatalogVersion(
+    ttl=float(os.environ.get('CATALOG_VERSION_TTL', 1.0))
+)
@@ -0,0 +1,176 @@
+"""Hot endpoint so'rovlarining EXPLAIN QUERY PLAN tekshiruvi
+
+Ishlatish:
+    python check_query_plans.py            # vaqtinchalik database da
+    python check_query_plans.py my.db      # mavjud database da
+
+So'rovlar qo'lda ko'chirilmaydi: endpoint'lar vaqtinchalik database da
+Flask test client orqali chaqiriladi va storage bajargan har bir SQL
+statement_hooks (sql_trace bilan bir xil kuzatuv nuqtasi) orqali yoziladi.
+So'ng ularning rejasi tekshiriladi (my.db berilsa - o'sha database da,
+u o'zgartirilmaydi). Birorta so'rov butun jadvalni skanerlasa, skript 1
+kodi bilan tugaydi.
+"""
+import base64
+import os
+import sys
+import tempfile
+
+import models_simple
+from sql_trace import _string_literal
+
+# Rejasi tekshiriladigan statement turlari (BEGIN, COMMIT, PRAGMA emas)
+PLANNED_PREFIXES = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+# Skanerlash muammo emas: har bir AUTOINCREMENT jadval uchun bitta qator
+SMALL_TABLES = ('sqlite_sequence',)
+
+def _sample_questions(count):
+    return [{
+        'question_text': f'Savol {i}',
+        'correct_answer': 'B',
+        'answers': [{'variant': v, 'text': f'{v}{i}'} for v in 'ABCD'],
+    } for i in range(count)]
+
+def record_hot_queries():
+    """Endpoint'larni chaqirib, bajarilgan SQL larni [(endpoint, sql)] ko'rinishida qaytarish"""
+    # Writer va purger so'rov thread'ida ishlasin - har bir SQL o'z endpoint'iga yoziladi
+    os.environ['STORAGE_BACKEND'] = 'sqlite'
+    os.environ['RESULT_WRITER_ENABLED'] = '0'
+    os.environ['TEST_PURGER_ENABLED'] = '0'
+    models_simple.DB_NAME = os.path.join(tempfile.mkdtemp(), 'hot_queries.db')
+    import app_simple
+    from purge import test_purger
+    app_simple.ensure_db()  # Migratsiyalar yozilmaydi
+
+    recorded = {}
+    endpoint = [None]
+
+    def record(sql, _elapsed):
+        if sql is None or endpoint[0] is None:
+            return
+        sql = ' '.join(sql.split())
+        if sql.upper().startswith(PLANNED_PREFIXES):
+            recorded.setdefault(sql, endpoint[0])
+
+    client = app_simple.app.test_client()
+
+    def call(name, method, url, **kwargs):
+        endpoint[0] = name
+        response = client.open(url, method=method, **kwargs)
+        endpoint[0] = None
+        if response.status_code >= 500:
+            raise RuntimeError(f'{method} {url}: {response.status_code} {response.get_data(as_text=True)}')
+        return response.get_json(silent=True) or {}
+
+    png = 'data:image/png;base64,' + base64.b64encode(b'\x89PNG\r\n\x1a\n' + b'0' * 64).decode()
+    models_simple.statement_hooks.append(record)
+    try:
+        call('login', 'POST', '/api/login', json={'id': 'u1', 'name': 'Ali'})
+        test_id = call('create_test', 'POST', '/api/tests/create', json={
+            'name': 'Algebra', 'class_level': '5-sinf', 'subject': 'Matematika',
+            'duration_minutes': 30, 'image': png, 'questions': _sample_questions(3),
+        })['test_id']
+        call('import_test', 'POST', '/api/tests/import?name=Import',
+             data='\n'.join(__import__('json').dumps(q) for q in _sample_questions(2)),
+             content_type='application/x-ndjson')
+        page = call('get_tests', 'GET', '/api/tests?limit=1')
+        call('get_tests', 'GET', f"/api/tests?limit=1&cursor={page['next_cursor']}")
+        call('get_tests', 'GET', '/api/tests?class_level=5-sinf')
+        call('get_tests', 'GET', '/api/tests?subject=Matematika')
+        call('get_tests', 'GET', '/api/tests?class_level=5-sinf&subject=Matematika')
+        call('get_tests', 'GET', '/api/tests?q=alg')
+        call('get_test', 'GET', f'/api/tests/{test_id}')
+        call('get_test_image', 'GET', f'/api/tests/{test_id}/image')
+        for i in range(3):
+            call('submit_test', 'POST', f'/api/tests/{test_id}/submit',
+                 json={'user_id': f'u{i + 1}', 'answers': ['B', 'A', 'B']})
+        call('submit_test', 'POST', f'/api/tests/{test_id}/submit',
+             json={'user_id': 'u1', 'answers': ['B', 'B', 'B']})  # takroriy natija
+        for sort in ('completed_at', 'score'):
+            page = call('get_test_results', 'GET', f'/api/results/{test_id}?limit=1&sort={sort}')
+            call('get_test_results', 'GET',
+                 f"/api/results/{test_id}?limit=1&sort={sort}&cursor={page['next_cursor']}")
+        page = call('get_user_results', 'GET', '/api/results/user/u1?limit=1')
+        call('get_user_results', 'GET', '/api/results/user/u1?limit=1&cursor=' + (page.get('next_cursor') or ''))
+        call('get_user_test_result', 'GET', f'/api/results/user/u1/test/{test_id}')
+        call('get_leaderboard', 'GET', f'/api/results/{test_id}/leaderboard')
+        call('get_user_rank', 'GET', f'/api/results/{test_id}/rank/u2')
+        call('get_test_stats', 'GET', f'/api/tests/{test_id}/stats')
+        call('delete_test', 'DELETE', f'/api/tests/{test_id}/delete', json={'code': '2025'})
+        endpoint[0] = 'purge'
+        conn = models_simple.get_db()
+        try:
+            test_purger.schedule_pending(conn.cursor())
+        finally:
+            conn.close()
+            endpoint[0] = None
+    finally:
+        models_simple.statement_hooks.remove(record)
+    return [(name, sql) for sql, name in recorded.items()]
+
+def full_scans(cursor, sql, params):
+    """So'rov rejasidan to'liq skanerlash qadamlarini topish: (scans, warnings, details)
+
+    warnings - LIMIT li, indeks tartibida o'qiladigan, lekin indekssiz LIKE
+    filtri bor so'rov: kam mos keladigan qidiruvda butun jadval o'qiladi.
+    """
+    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+    details = [row[3] for row in cursor.fetchall()]
+    # "SCAN jadval" - indekssiz to'liq skanerlash.
+    # "SEARCH ... USING INDEX" yoki "USING INTEGER PRIMARY KEY" - indeks orqali.
+    # LIMIT li so'rovda "SCAN ... USING INDEX" tartib bo'yicha o'qib, erta to'xtaydi.
+    normalized = ' '.join(sql.split()).upper()
+    limited = ' LIMIT ' in normalized
+    scans, warnings = [], []
+    for d in details:
+        if not d.startswith('SCAN ') or d.split()[1] in SMALL_TABLES:
+            continue
+        if limited and 'USING' in d and 'INDEX' in d:
+            if ' LIKE ' in normalized:
+                warnings.append(d)
+            continue
+        scans.append(d)
+    # Tartiblash uchun vaqtinchalik B-tree - barcha mos qatorlar xotirada saralanadi
+    scans += [d for d in details if 'TEMP B-TREE' in d]
+    return scans, warnings, details
+
+def check(db_name=None):
+    """Barcha hot so'rovlarni tekshirish: (muammolar, ogohlantirishlar)"""
+    hot_queries = record_hot_queries()
+    if db_name:
+        models_simple.DB_NAME = db_name
+    models_simple.init_db()
+    conn = models_simple.get_db()
+    cursor = conn.cursor()
+    problems = []
+    warnings = []
+    for endpoint, sql in hot_queries:
+        # Reja parametr qiymatlariga bog'liq emas - hammasi NULL
+        params = (None,) * _string_literal.sub('', sql).count('?')
+        scans, like_scans, details = full_scans(cursor, sql, params)
+        status = 'SCAN' if scans else 'WARN' if like_scans else 'OK'
+        print(f"[{status:4}] {endpoint}: {' '.join(sql.split())}")
+        for detail in details:
+            print(f"         {detail}")
+        if scans:
+            problems.append((endpoint, sql, scans))
+        elif like_scans:
+            warnings.append((endpoint, sql, like_scans))
+    conn.close()
+    return problems, warnings
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        db_name = sys.argv[1]
+    else:
+        db_name = os.path.join(tempfile.mkdtemp(), 'query_plans.db')
+    problems, warnings = check(db_name)
+    print("=" * 50)
+    if warnings:
+        print(f"{len(warnings)} ta qidiruv so'rovi indeks tartibida LIMIT gacha skanerlaydi "
+              "(LIKE indekssiz - kam mos kelsa butun jadval o'qiladi)")
+    if problems:
+        print(f"{len(problems)} ta so'rov butun jadvalni skanerlaydi")
+        sys.exit(1)
+    print("Barcha hot so'rovlar indeks orqali bajariladi")
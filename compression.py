@@ -0,0 +1,160 @@
+"""Javoblarni siqish (gzip, brotli o'rnatilgan bo'lsa br)
+
+Dinamik JSON javoblar after_request da Accept-Encoding bo'yicha siqiladi.
+static/ dagi fayllar va sahifalar (templates) ishga tushganda bir marta
+siqiladi va tayyor holda beriladi.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import request, make_response, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # brotli ixtiyoriy - bo'lmasa faqat gzip
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/javascript',
+    'image/svg+xml',
+}
+
+# Dinamik javoblar uchun (tezlik muhim) va oldindan siqish uchun (hajm muhim)
+GZIP_LEVEL = 6
+GZIP_LEVEL_STATIC = 9
+BROTLI_QUALITY = 5
+BROTLI_QUALITY_STATIC = 11
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def choose_encoding():
+    """Accept-Encoding bo'yicha eng mos kodlash (yoki None)"""
+    accept = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding in available_encodings():
+        quality = accept[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def encoded_etag(etag, encoding):
+    """Siqilgan ko'rinish uchun kuchli ETag: kodlash nomi qo'shiladi"""
+    return f'{etag}-{encoding}' if encoding else etag
+
+def compress(data, encoding, static=False):
+    if encoding == 'br':
+        return brotli.compress(
+            data, quality=BROTLI_QUALITY_STATIC if static else BROTLI_QUALITY
+        )
+    # mtime=0 - bir xil ma'lumot uchun bir xil baytlar (ETag barqaror)
+    return gzip.compress(
+        data, compresslevel=GZIP_LEVEL_STATIC if static else GZIP_LEVEL, mtime=0
+    )
+
+class Precompressed:
+    """Oldindan siqilgan bitta fayl yoki sahifa (barcha kodlashlarda)"""
+    __slots__ = ('mimetype', 'etag', 'variants')
+
+    def __init__(self, data, mimetype):
+        self.mimetype = mimetype
+        self.etag = hashlib.sha1(data).hexdigest()[:16]
+        self.variants = {None: data}
+        for encoding in available_encodings():
+            compressed = compress(data, encoding, static=True)
+            if len(compressed) < len(data):
+                self.variants[encoding] = compressed
+
+    def response(self):
+        encoding = choose_encoding()
+        if encoding not in self.variants:
+            encoding = None
+        response = make_response(self.variants[encoding])
+        response.mimetype = self.mimetype
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'no-cache'
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(encoded_etag(self.etag, encoding))
+        return response.make_conditional(request)
+
+def precompress_directory(folder):
+    """Papkadagi siqiladigan fayllarni siqib, {fayl nomi: Precompressed} qaytarish"""
+    assets = {}
+    if not folder or not os.path.isdir(folder):
+        return assets
+    for root, _dirs, files in os.walk(folder):
+        for name in files:
+            mimetype = mimetypes.guess_type(name)[0]
+            if mimetype not in COMPRESSIBLE_MIMETYPES:
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            filename = os.path.relpath(path, folder).replace(os.sep, '/')
+            assets[filename] = Precompressed(data, mimetype)
+    return assets
+
+def init_compression(app, min_size=500):
+    """Dinamik javoblarni siqish va static fayllarni oldindan siqilgan holda berish"""
+    static_assets = precompress_directory(app.static_folder)
+
+    def static_view(filename):
+        asset = static_assets.get(filename)
+        if asset is None:
+            return send_from_directory(app.static_folder, filename)
+        return asset.response()
+
+    if 'static' in app.view_functions:
+        app.view_functions['static'] = static_view
+
+    @app.after_request
+    def _compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        if response.status_code < 200 or response.status_code in (204, 304):
+            return response
+        if response.content_length is not None and response.content_length < min_size:
+            return response
+        encoding = choose_encoding()
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        # Siqilgan ko'rinish baytma-bayt boshqa - ETag ga kodlash qo'shiladi
+        # (kuchli ETag kuchli bo'lib qoladi, If-Range ishlaydi)
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(encoded_etag(etag, encoding), weak=weak)
+        return response
+
+    app.extensions['compression'] = {'static_assets': len(static_assets)}
+    return static_assets
+
+_pages = {}
+
+def render_page(render, template_name, cache=True):
+    """Sahifani bir marta render qilib, siqilgan holda keshlash
+
+    Sahifalar so'rovga bog'liq ma'lumot ishlatmaydi (faqat url_for('static')).
+    cache=False (debug rejimi) - har safar qayta render qilinadi.
+    """
+    page = _pages.get(template_name) if cache else None
+    if page is None:
+        page = Precompressed(render(template_name).encode('utf-8'), 'text/html')
+        if cache:
+            _pages[template_name] = page
+    return page.response()
@@ -0,0 +1,86 @@
+"""6 xonali test ID larini takrorlanmasdan ajratish
+
+ID = permutatsiya(hisoblagich). Hisoblagich database da saqlanadi va har
+safar 1 ga oshadi, permutatsiya esa kalitli Feistel tarmog'i
+(1000 x 1000 yarimlar ustida). Shu sababli ID lar tasodifiy ko'rinadi,
+lekin tekshirib-qayta urinish kerak emas: har bir hisoblagich qiymati
+boshqa ID beradi.
+"""
+import hashlib
+import secrets
+from functools import lru_cache
+
+ID_DIGITS = 6
+ID_SPACE = 10 ** ID_DIGITS
+_HALF = 1000  # ID_SPACE = _HALF * _HALF
+_ROUNDS = 4
+
+def create_id_allocator_table(cursor):
+    """Hisoblagich va permutatsiya kaliti jadvalini yaratish"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS id_allocator (
+            name TEXT PRIMARY KEY,
+            counter INTEGER NOT NULL DEFAULT 0,
+            secret TEXT NOT NULL
+        )
+    ''')
+    # Kalit database bilan birga saqlanadi - barcha jarayonlar bir xil permutatsiyani ishlatadi
+    cursor.execute(
+        "INSERT OR IGNORE INTO id_allocator (name, counter, secret) VALUES ('tests', 0, ?)",
+        (secrets.token_hex(16),)
+    )
+
+@lru_cache(maxsize=8)
+def _round_tables(secret):
+    """Har bir raund uchun F(R) qiymatlari jadvali (kalit bo'yicha bir marta)"""
+    tables = []
+    for round_number in range(_ROUNDS):
+        table = []
+        for value in range(_HALF):
+            digest = hashlib.blake2b(
+                f'{round_number}:{value}'.encode(), key=secret.encode(), digest_size=8
+            ).digest()
+            table.append(int.from_bytes(digest, 'big') % _HALF)
+        tables.append(tuple(table))
+    return tuple(tables)
+
+def permute(counter, secret):
+    """[0, ID_SPACE) oralig'idagi o'zaro bir qiymatli aralashtirish"""
+    left, right = divmod(counter, _HALF)
+    for table in _round_tables(secret):
+        left, right = right, (left + table[right]) % _HALF
+    return left * _HALF + right
+
+def allocate_test_id(cursor):
+    """Keyingi bo'sh test ID sini ajratish
+
+    Chaqiruvchi BEGIN IMMEDIATE tranzaksiyasi ichida bo'lishi kerak.
+    Eski (tasodifiy yaratilgan) ID ga to'g'ri kelgan qiymat o'tkazib
+    yuboriladi - bunday o'tkazishlar soni eski testlar sonidan oshmaydi.
+    """
+    cursor.execute("SELECT counter, secret FROM id_allocator WHERE name = 'tests'")
+    counter, secret = cursor.fetchone()
+    while True:
+        if counter >= ID_SPACE:
+            raise Exception('Bo\'sh test ID qolmadi')
+        test_id = str(permute(counter, secret)).zfill(ID_DIGITS)
+        counter += 1
+        cursor.execute('SELECT 1 FROM tests WHERE id = ?', (test_id,))
+        if not cursor.fetchone():
+            break
+    cursor.execute(
+        "UPDATE id_allocator SET counter = ? WHERE name = 'tests'",
+        (counter,)
+    )
+    return test_id
+
+def id_space_stats(cursor):
+    """ID maydonidan qancha qismi ishlatilgani (monitoring uchun)"""
+    cursor.execute("SELECT counter FROM id_allocator WHERE name = 'tests'")
+    row = cursor.fetchone()
+    allocated = row[0] if row else 0
+    return {
+        'allocated': allocated,
+        'capacity': ID_SPACE,
+        'used_fraction': round(allocated / ID_SPACE, 6),
+    }
@@ -0,0 +1,230 @@
+"""So'rovlar metrikasi - Prometheus text formatida /api/metrics uchun
+
+Har bir route bo'yicha: kechikish histogrammasi va oxirgi so'rovlar
+oynasidan p50/p95/p99, status kodlari soni, so'rov boshiga SQL
+statement'lar soni va umumiy vaqti. SLOW_REQUEST_MS dan sekin so'rovlar
+log qilinadi.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from flask import request, g
+
+import models_simple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+QUANTILES = (0.5, 0.95, 0.99)
+
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 500))
+# Kvantillar hisoblanadigan oxirgi so'rovlar soni (har bir route uchun)
+LATENCY_WINDOW = int(os.environ.get('METRICS_LATENCY_WINDOW', 1024))
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+class RouteMetrics:
+    __slots__ = ('latency', 'recent', 'statuses', 'sql_count', 'sql_statements',
+                 'sql_seconds', 'slow')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+        self.statuses = {}
+        self.sql_count = Histogram(SQL_COUNT_BUCKETS)
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.slow = 0
+
+class RequestSQL:
+    """Bitta so'rov davomidagi SQL statement'lar soni va vaqti"""
+    __slots__ = ('statements', 'seconds')
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+_lock = threading.Lock()
+_routes = {}
+_current = threading.local()
+
+def _on_statement(sql, elapsed):
+    stats = getattr(_current, 'sql', None)
+    if stats is None:
+        return  # So'rovdan tashqari (masalan, result_writer thread'i)
+    if sql is not None:
+        stats.statements += 1
+    stats.seconds += elapsed
+
+def begin_request():
+    """Joriy thread'da SQL hisoblashni boshlash"""
+    _current.sql = RequestSQL()
+    return time.perf_counter()
+
+def end_request():
+    sql = getattr(_current, 'sql', None)
+    _current.sql = None
+    return sql
+
+def record_request(route, method, status, elapsed, sql=None):
+    """Tugagan so'rovni metrikalarga qo'shish va sekin bo'lsa log qilish"""
+    with _lock:
+        metrics = _routes.get(route)
+        if metrics is None:
+            metrics = _routes[route] = RouteMetrics()
+        metrics.latency.observe(elapsed)
+        metrics.recent.append(elapsed)
+        key = (method, status)
+        metrics.statuses[key] = metrics.statuses.get(key, 0) + 1
+        if sql is not None:
+            metrics.sql_count.observe(sql.statements)
+            metrics.sql_statements += sql.statements
+            metrics.sql_seconds += sql.seconds
+        slow = elapsed * 1000 >= SLOW_REQUEST_MS
+        if slow:
+            metrics.slow += 1
+    if slow:
+        sql_info = f", SQL: {sql.statements} ta / {sql.seconds * 1000:.1f} ms" if sql else ''
+        print(f"Sekin so'rov: {method} {route} -> {status}, {elapsed * 1000:.1f} ms{sql_info}")
+
+def init_metrics(app):
+    """Flask app uchun so'rov metrikalarini yoqish
+
+    Kompressiyadan oldin chaqirilishi kerak - after_request'lar teskari
+    tartibda bajariladi, shunda siqish vaqti ham hisobga olinadi.
+    """
+    if _on_statement not in models_simple.statement_hooks:
+        models_simple.statement_hooks.append(_on_statement)
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = begin_request()
+
+    @app.after_request
+    def _remember_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _record(exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        sql = end_request()
+        # Xatolik bilan tugagan so'rovda after_request chaqirilmaydi
+        status = g.pop('metrics_status', 500)
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        record_request(route, request.method, status, elapsed, sql)
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _quantile(sorted_values, q):
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+def _histogram_lines(name, label, buckets, total, count):
+    for bound, cumulative in buckets:
+        yield f'{name}_bucket{{route="{label}",le="{bound}"}} {cumulative}'
+    yield f'{name}_bucket{{route="{label}",le="+Inf"}} {count}'
+    yield f'{name}_sum{{route="{label}"}} {total:.6f}'
+    yield f'{name}_count{{route="{label}"}} {count}'
+
+def render_prometheus():
+    """Barcha metrikalarni Prometheus text (0.0.4) formatida qaytarish"""
+    with _lock:
+        snapshot = [
+            {
+                'label': _label(route),
+                'latency': (list(m.latency.cumulative()), m.latency.sum, m.latency.count),
+                'recent': sorted(m.recent),
+                'statuses': sorted(m.statuses.items()),
+                'sql_count': (list(m.sql_count.cumulative()), m.sql_count.sum, m.sql_count.count),
+                'sql_statements': m.sql_statements,
+                'sql_seconds': m.sql_seconds,
+                'slow': m.slow,
+            }
+            for route, m in sorted(_routes.items())
+        ]
+
+    lines = [
+        "# HELP http_requests_total So'rovlar soni (route, method, status bo'yicha)",
+        '# TYPE http_requests_total counter',
+    ]
+    for r in snapshot:
+        for (method, status), count in r['statuses']:
+            lines.append(
+                f'http_requests_total{{route="{r["label"]}",method="{method}",'
+                f'status="{status}"}} {count}'
+            )
+
+    lines += [
+        "# HELP http_request_duration_seconds So'rov kechikishi",
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for r in snapshot:
+        lines += _histogram_lines('http_request_duration_seconds', r['label'], *r['latency'])
+
+    lines += [
+        f"# HELP http_request_duration_quantile_seconds Oxirgi {LATENCY_WINDOW} ta so'rov kechikishi kvantillari",
+        '# TYPE http_request_duration_quantile_seconds gauge',
+    ]
+    for r in snapshot:
+        for q in QUANTILES:
+            if r['recent']:
+                lines.append(
+                    f'http_request_duration_quantile_seconds{{route="{r["label"]}",'
+                    f'quantile="{q}"}} {_quantile(r["recent"], q):.6f}'
+                )
+
+    lines += [
+        "# HELP sql_statements_per_request Bitta so'rovdagi SQL statement'lar soni",
+        '# TYPE sql_statements_per_request histogram',
+    ]
+    for r in snapshot:
+        lines += _histogram_lines('sql_statements_per_request', r['label'], *r['sql_count'])
+
+    lines += [
+        "# HELP sql_statements_total SQL statement'lar soni",
+        '# TYPE sql_statements_total counter',
+    ]
+    lines += [f'sql_statements_total{{route="{r["label"]}"}} {r["sql_statements"]}' for r in snapshot]
+    lines += [
+        "# HELP sql_duration_seconds_total SQL statement'larga sarflangan vaqt",
+        '# TYPE sql_duration_seconds_total counter',
+    ]
+    lines += [f'sql_duration_seconds_total{{route="{r["label"]}"}} {r["sql_seconds"]:.6f}' for r in snapshot]
+    lines += [
+        f"# HELP slow_requests_total {SLOW_REQUEST_MS:g} ms dan sekin so'rovlar",
+        '# TYPE slow_requests_total counter',
+    ]
+    lines += [f'slow_requests_total{{route="{r["label"]}"}} {r["slow"]}' for r in snapshot]
+    return '\n'.join(lines) + '\n'
+
+def reset():
+    """Barcha metrikalarni tozalash"""
+    with _lock:
+        _routes.clear()
@@ -1,67 +1,322 @@
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+"""SQLAlchemy modellari va engine (STORAGE_BACKEND=sqlalchemy uchun)
 
-db = SQLAlchemy()
+Jadvallar models_simple sxemasi bilan bir xil (nomlar, ustunlar,
+indekslar, SQLite da AUTOINCREMENT), shuning uchun bitta SQLite faylini
+ikkala qatlam ham ochadi. DATABASE_URL orqali boshqa database ham
+ulanadi, masalan lokal Postgres:
 
-class User(db.Model):
+    DATABASE_URL=postgresql+psycopg://localhost/matematika STORAGE_BACKEND=sqlalchemy
+
+ForeignKey cheklovlari yo'q: models_simple sxemasida ular SQLite da
+majburiy emas (PRAGMA foreign_keys o'chiq), kod ham shunga tayanadi -
+natija login qilmagan user_id bilan yoziladi, purge qatorlarni bo'laklab,
+ixtiyoriy tartibda o'chiradi. Server database da cheklov bo'lsa, bular
+buziladi. Shuning uchun relationship'lar primaryjoin + foreign() bilan
+aniq yoziladi.
+
+Kolleksiya relationship'lari lazy='raise': savollar yoki natijalar
+so'rovda loader opsiyasi (selectinload/joinedload) bilan aniq
+ko'rsatilmasa, ularga murojaat xatolik beradi - yashirin N+1 bo'lmaydi.
+"""
+import os
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    Column, DateTime, Float, Index, Integer, LargeBinary, String, Text,
+    create_engine, event, select
+)
+from sqlalchemy.orm import DeclarativeBase, relationship, selectinload, sessionmaker
+from sqlalchemy.types import TypeDecorator
+
+import models_simple
+from models_simple import STATS_BUCKETS
+
+# Pool sozlamalari (SQLite fayli va server database lari uchun)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def utc_now():
+    """SQLite CURRENT_TIMESTAMP bilan bir xil format (UTC)"""
+    return datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+class Timestamp(TypeDecorator):
+    """Python tomonida 'YYYY-MM-DD HH:MM:SS' satri
+
+    SQLite da TEXT (models_simple yozgan qatorlar bilan bir xil), boshqa
+    database larda DateTime. Shu tufayli API va pagination cursor'lari
+    ikkala holatda ham bir xil qiymat ko'radi.
+    """
+    impl = DateTime
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'sqlite':
+            return dialect.type_descriptor(Text())
+        return dialect.type_descriptor(DateTime())
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, datetime):
+            value = value.strftime(TIMESTAMP_FORMAT)
+        if value is None or dialect.name == 'sqlite':
+            return value
+        return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, datetime):
+            return value.strftime(TIMESTAMP_FORMAT)
+        return value
+
+class Base(DeclarativeBase):
+    pass
+
+class User(Base):
     """Foydalanuvchi modeli"""
     __tablename__ = 'users'
-    
-    id = db.Column(db.String(50), primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
+
+    id = Column(String(50), primary_key=True)
+    name = Column(String(100), nullable=False)
+    created_at = Column(Timestamp, default=utc_now)
+
+    results = relationship(
+        'TestResult', back_populates='user', lazy='raise',
+        primaryjoin='User.id == foreign(TestResult.user_id)'
+    )
+
     def __repr__(self):
         return f'<User {self.name}>'
 
-class Test(db.Model):
+class Image(Base):
+    """Test rasmi (hash bo'yicha bir marta saqlanadi)"""
+    __tablename__ = 'images'
+
+    hash = Column(String(64), primary_key=True)
+    mime_type = Column(String(50), nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(Timestamp, default=utc_now)
+
+class Test(Base):
     """Test modeli"""
     __tablename__ = 'tests'
-    
-    id = db.Column(db.String(6), primary_key=True)
-    name = db.Column(db.String(200), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
+    __table_args__ = (
+        Index('idx_tests_created', 'created_at', 'id'),
+        Index('idx_tests_class_created', 'class_level', 'created_at', 'id'),
+        Index('idx_tests_subject_created', 'subject', 'created_at', 'id'),
+        Index('idx_tests_class_subject_created', 'class_level', 'subject', 'created_at', 'id'),
+        Index('idx_tests_image_hash', 'image_hash'),
+    )
+
+    id = Column(String(6), primary_key=True)
+    name = Column(String(200), nullable=False)
+    image = Column(Text)  # Eski inline rasm; yangilari images jadvalida
+    image_hash = Column(String(64))  # images.hash
+    class_level = Column(String(50))
+    duration_minutes = Column(Integer)
+    subject = Column(String(100))
+    created_at = Column(Timestamp, default=utc_now)
+    deleted_at = Column(Timestamp)  # Soft delete - qatorlar keyin tozalanadi
+
+    questions = relationship(
+        'Question', back_populates='test', order_by='Question.id', lazy='raise',
+        primaryjoin='Test.id == foreign(Question.test_id)'
+    )
+    results = relationship(
+        'TestResult', back_populates='test', lazy='raise',
+        primaryjoin='Test.id == foreign(TestResult.test_id)'
+    )
+    stats = relationship(
+        'TestStats', uselist=False, lazy='raise',
+        primaryjoin='Test.id == foreign(TestStats.test_id)'
+    )
+
     def __repr__(self):
         return f'<Test {self.name}>'
 
-class Question(db.Model):
+class Question(Base):
     """Savol modeli"""
     __tablename__ = 'questions'
-    
-    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    test_id = db.Column(db.String(6), db.ForeignKey('tests.id'), nullable=False)
-    question_text = db.Column(db.Text, nullable=False)
-    correct_answer = db.Column(db.String(1), nullable=False)  # A, B, C, yoki D
-    
+    __table_args__ = (
+        # correct_answer ham indeksda - javoblar kaliti jadvalga murojaatsiz o'qiladi
+        Index('idx_questions_test', 'test_id', 'id', 'correct_answer'),
+        {'sqlite_autoincrement': True},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    test_id = Column(String(6), nullable=False)  # tests.id
+    question_text = Column(Text, nullable=False)
+    correct_answer = Column(String(1), nullable=False)  # A, B, C, yoki D
+
+    test = relationship(
+        'Test', back_populates='questions', lazy='raise',
+        primaryjoin='Test.id == foreign(Question.test_id)'
+    )
+    answers = relationship(
+        'Answer', back_populates='question', order_by='Answer.id', lazy='raise',
+        primaryjoin='Question.id == foreign(Answer.question_id)'
+    )
+
     def __repr__(self):
         return f'<Question {self.id}>'
 
-class Answer(db.Model):
+class Answer(Base):
     """Javob variantlari modeli"""
     __tablename__ = 'answers'
-    
-    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
-    variant = db.Column(db.String(1), nullable=False)  # A, B, C, yoki D
-    text = db.Column(db.Text, nullable=False)
-    
+    __table_args__ = (
+        Index('idx_answers_question', 'question_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    question_id = Column(Integer, nullable=False)  # questions.id
+    variant = Column(String(1), nullable=False)  # A, B, C, yoki D
+    text = Column(Text, nullable=False)
+
+    question = relationship(
+        'Question', back_populates='answers', lazy='raise',
+        primaryjoin='Question.id == foreign(Answer.question_id)'
+    )
+
     def __repr__(self):
         return f'<Answer {self.variant}>'
 
-class TestResult(db.Model):
+class TestResult(Base):
     """Test natijalari modeli"""
     __tablename__ = 'test_results'
-    
-    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    test_id = db.Column(db.String(6), db.ForeignKey('tests.id'), nullable=False)
-    user_id = db.Column(db.String(50), db.ForeignKey('users.id'), nullable=False)
-    score = db.Column(db.Float, nullable=False)  # Foizda
-    correct_answers = db.Column(db.Integer, nullable=False)
-    total_questions = db.Column(db.Integer, nullable=False)
-    completed_at = db.Column(db.DateTime, default=datetime.utcnow)
-    
+    __table_args__ = (
+        # Bitta foydalanuvchi testni faqat bir marta ishlaydi
+        Index('ux_test_results_test_user', 'test_id', 'user_id', unique=True),
+        Index('idx_test_results_test_completed', 'test_id', 'completed_at'),
+        Index('idx_test_results_user_completed', 'user_id', 'completed_at'),
+        {'sqlite_autoincrement': True},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    test_id = Column(String(6), nullable=False)  # tests.id
+    user_id = Column(String(50), nullable=False)  # users.id
+    score = Column(Float, nullable=False)  # Foizda
+    correct_answers = Column(Integer, nullable=False)
+    total_questions = Column(Integer, nullable=False)
+    completed_at = Column(Timestamp, default=utc_now)
+
+    test = relationship(
+        'Test', back_populates='results', lazy='raise',
+        primaryjoin='Test.id == foreign(TestResult.test_id)'
+    )
+    user = relationship(
+        'User', back_populates='results', lazy='raise',
+        primaryjoin='User.id == foreign(TestResult.user_id)'
+    )
+
     def __repr__(self):
         return f'<TestResult {self.id}>'
 
+# Reyting indeksi (storage.RANK_ORDER bilan bir xil tartib)
+Index(
+    'idx_test_results_rank', TestResult.test_id, TestResult.score.desc(),
+    TestResult.correct_answers.desc(), TestResult.completed_at, TestResult.id
+)
+
+class TestStats(Base):
+    """Har bir test uchun yig'ma statistika (natija qo'shilganda yangilanadi)"""
+    __tablename__ = 'test_stats'
+
+    test_id = Column(String(6), primary_key=True)  # tests.id
+    result_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0)
+    score_sq_sum = Column(Float, nullable=False, default=0)
+
+# Histogramma ustunlari: bucket_0 ... bucket_{STATS_BUCKETS - 1}
+for _i in range(STATS_BUCKETS):
+    setattr(TestStats, f'bucket_{_i}', Column(Integer, nullable=False, default=0))
+
+class IdAllocator(Base):
+    """Test ID hisoblagichi va permutatsiya kaliti (id_allocator.py)"""
+    __tablename__ = 'id_allocator'
+
+    name = Column(String(50), primary_key=True)
+    counter = Column(Integer, nullable=False, default=0)
+    secret = Column(String(64), nullable=False)
+
+class CatalogVersion(Base):
+    """Katalog versiyasi - ETag uchun (catalog.py)"""
+    __tablename__ = 'catalog_version'
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    epoch = Column(String(16), nullable=False)
+    updated_at = Column(Integer, nullable=False)
+
+def load_test(session, test_id):
+    """O'chirilmagan testni savollari va javob variantlari bilan olish
+
+    selectinload: test, savollar va javoblar uchun jami 3 ta so'rov -
+    savollar soniga bog'liq emas. joinedload dan farqli ravishda test
+    ustunlari har bir javob qatorida takrorlanmaydi.
+    """
+    return session.scalars(
+        select(Test)
+        .where(Test.id == test_id, Test.deleted_at.is_(None))
+        .options(selectinload(Test.questions).selectinload(Question.answers))
+    ).first()
+
+def database_url():
+    """DATABASE_URL yoki models_simple.DB_NAME dagi SQLite fayli"""
+    return os.environ.get('DATABASE_URL') or f'sqlite:///{models_simple.DB_NAME}'
+
+def _configure_sqlite(dbapi_connection, _record):
+    # models_simple._open_connection bilan bir xil PRAGMA lar
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('PRAGMA journal_mode=WAL')
+    except Exception:
+        pass  # Read-only fayl tizimida WAL yoqilmaydi
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f'PRAGMA mmap_size={models_simple.DB_MMAP_SIZE}')
+    cursor.execute(f'PRAGMA busy_timeout={models_simple.DB_BUSY_TIMEOUT_MS}')
+    cursor.close()
+    for hook in models_simple.connection_hooks:
+        hook(dbapi_connection)
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    # metrics.py va sql_trace.py kuzatuvchilariga xabar berish
+    if models_simple.statement_hooks:
+        started = conn.info.pop('query_started', None)
+        if started is not None:
+            models_simple._notify_hooks(statement, time.perf_counter() - started)
+
+def make_engine(url=None):
+    """Pool'li engine yaratish
+
+    Server database lari uchun pool_pre_ping va pool_recycle - uzilgan
+    connection'lar so'rovgacha almashtiriladi.
+    """
+    url = url or database_url()
+    if url.startswith('sqlite'):
+        engine = create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_POOL_MAX_OVERFLOW,
+            connect_args={'timeout': models_simple.DB_BUSY_TIMEOUT_MS / 1000},
+        )
+        event.listen(engine, 'connect', _configure_sqlite)
+    else:
+        engine = create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_POOL_MAX_OVERFLOW,
+            pool_pre_ping=True,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    event.listen(engine, 'before_cursor_execute', _before_execute)
+    event.listen(engine, 'after_cursor_execute', _after_execute)
+    return engine
 
+def make_session_factory(engine):
+    # expire_on_commit=False: commit dan keyin obyektlar qayta o'qilmaydi
+    return sessionmaker(bind=engine, expire_on_commit=False)
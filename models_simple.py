@@ -1,24 +1,215 @@
 import sqlite3
 from datetime import datetime
+import base64
+import binascii
+import hashlib
 import os
+import threading
+import time
+import weakref
+
+from id_allocator import create_id_allocator_table
+from catalog import create_catalog_version_table
 
 DB_NAME = 'matematika_test.db'
 
+# Connection pool sozlamalari
+DB_BUSY_TIMEOUT_MS = 5000
+DB_MMAP_SIZE = 256 * 1024 * 1024  # 256 MB
+
+_pool_local = threading.local()
+_pool_lock = threading.Lock()
+_pool_connections = weakref.WeakSet()
+_pool_counters = {
+    'created': 0,
+    'checkouts': 0,
+    'reused': 0,
+    'checkins': 0,
+    'rollbacks': 0,
+}
+
+def _pool_count(name):
+    with _pool_lock:
+        _pool_counters[name] += 1
+
+# SQL kuzatuvchilari: hook(sql, elapsed) - metrics.py ro'yxatdan o'tkazadi.
+# fetch* vaqti sql=None bilan xabar qilinadi (so'rov soniga qo'shilmaydi).
+statement_hooks = []
+
+# Yangi ochilgan har bir connection uchun chaqiriladi: hook(conn).
+# add_connection_hook orqali qo'shiladi (masalan, sql_trace.py).
+connection_hooks = []
+
+def add_connection_hook(hook):
+    """Hook ni ro'yxatga qo'shish va allaqachon ochilgan connection larga qo'llash"""
+    if hook in connection_hooks:
+        return
+    connection_hooks.append(hook)
+    with _pool_lock:
+        connections = [c for c in _pool_connections if not c.disposed]
+    for conn in connections:
+        hook(conn)
+
+def _notify_hooks(sql, elapsed):
+    for hook in statement_hooks:
+        hook(sql, elapsed)
+
+class TimedCursor(sqlite3.Cursor):
+    """Kuzatuvchilar bo'lsa, har bir so'rov vaqtini o'lchaydigan cursor"""
+
+    def execute(self, sql, parameters=()):
+        if not statement_hooks:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _notify_hooks(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not statement_hooks:
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _notify_hooks(sql, time.perf_counter() - start)
+
+    def _timed_fetch(self, fetch, *args):
+        if not statement_hooks:
+            return fetch(*args)
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            _notify_hooks(None, time.perf_counter() - start)
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._timed_fetch(super().fetchmany)
+        return self._timed_fetch(super().fetchmany, size)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall)
+
+class PooledConnection(sqlite3.Connection):
+    """Pool'dagi connection - close() uni yopmaydi, pool'ga qaytaradi"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute ichki cursor yaratadi - TimedCursor orqali o'tkazish
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        release_db(self)
+
+    def dispose(self):
+        """Connection ni haqiqatan yopish"""
+        self.disposed = True
+        self.depth = 0
+        super().close()
+
+def _open_connection():
+    """Yangi connection ochish va PRAGMA larni sozlash"""
+    conn = sqlite3.connect(
+        DB_NAME,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        factory=PooledConnection,
+        # Har bir connection faqat o'z thread'ida ishlatiladi, lekin
+        # close_pool() ularni boshqa thread'dan yopa olishi kerak
+        check_same_thread=False
+    )
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+    except sqlite3.OperationalError:
+        pass  # Read-only fayl tizimida WAL yoqilmaydi
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE}')
+    conn.execute(f'PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}')
+    conn.db_name = DB_NAME
+    conn.depth = 0
+    conn.disposed = False
+    for hook in connection_hooks:
+        hook(conn)
+    with _pool_lock:
+        _pool_connections.add(conn)
+        _pool_counters['created'] += 1
+    return conn
+
 def get_db():
-    """Database connection olish"""
+    """Database connection olish (har bir thread uchun bitta uzoq yashovchi connection)"""
     try:
-        conn = sqlite3.connect(DB_NAME)
-        conn.row_factory = sqlite3.Row
+        conn = getattr(_pool_local, 'conn', None)
+        if conn is not None and conn.disposed:
+            conn = None
+        elif conn is not None and conn.db_name != DB_NAME:
+            # DB_NAME o'zgargan (masalan, testlarda) - eski connection ni tashlash
+            conn.dispose()
+            conn = None
+        if conn is None:
+            conn = _open_connection()
+            _pool_local.conn = conn
+        elif conn.depth == 0:
+            _pool_count('reused')
+        conn.depth += 1
+        _pool_count('checkouts')
         return conn
     except Exception as e:
         # Vercel'da SQLite ishlamaydi (read-only filesystem)
         raise Exception(f"SQLite Vercel'da ishlamaydi. Cloud database sozlash kerak. Xatolik: {str(e)}")
 
-def init_db():
-    """Database jadvallarini yaratish"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
+def release_db(conn=None, force=False):
+    """Connection ni pool'ga qaytarish
+
+    Commit qilinmagan tranzaksiya oxirgi checkin'da rollback qilinadi,
+    shunda keyingi so'rov toza connection oladi.
+    """
+    if conn is None:
+        conn = getattr(_pool_local, 'conn', None)
+    if conn is None or conn.depth == 0:
+        return
+    conn.depth = 0 if force else conn.depth - 1
+    if conn.depth == 0:
+        if conn.in_transaction:
+            conn.rollback()
+            _pool_count('rollbacks')
+        _pool_count('checkins')
+
+def init_db_pool(app):
+    """Flask app uchun teardown hook ro'yxatdan o'tkazish"""
+    @app.teardown_appcontext
+    def _release_db_on_teardown(exc):
+        release_db(force=True)
+
+def pool_stats():
+    """Pool statistikasi (monitoring uchun)"""
+    with _pool_lock:
+        connections = list(_pool_connections)
+        stats = dict(_pool_counters)
+    stats['open'] = len(connections)
+    stats['in_use'] = sum(1 for c in connections if c.depth > 0)
+    return stats
+
+def close_pool():
+    """Barcha pool connection larini yopish"""
+    with _pool_lock:
+        connections = list(_pool_connections)
+        _pool_connections.clear()
+    for conn in connections:
+        conn.dispose()
+    _pool_local.conn = None
+
+def _create_base_tables(cursor):
+    """Asosiy jadvallar (eng birinchi sxema)"""
     # Users jadvali
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -76,27 +267,385 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users(id)
         )
     ''')
-    
-    # Agar ustunlar bo'lmasa, qo'shish (mavjud database lar uchun)
-    try:
-        cursor.execute('ALTER TABLE tests ADD COLUMN image TEXT')
-    except sqlite3.OperationalError:
-        pass  # Ustun allaqachon mavjud
-    try:
-        cursor.execute('ALTER TABLE tests ADD COLUMN class_level TEXT')
-    except sqlite3.OperationalError:
-        pass  # Ustun allaqachon mavjud
+
+def _add_column(cursor, table, column, definition):
+    """Ustun bo'lmasa qo'shish (eski database lar uchun)"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+def _add_test_columns(cursor):
+    """tests jadvaliga keyin qo'shilgan ustunlar"""
+    _add_column(cursor, 'tests', 'image', 'TEXT')
+    _add_column(cursor, 'tests', 'class_level', 'TEXT')
+    _add_column(cursor, 'tests', 'duration_minutes', 'INTEGER')
+    _add_column(cursor, 'tests', 'subject', 'TEXT')
+    _add_column(cursor, 'tests', 'image_hash', 'TEXT')
+    # O'chirilgan test darhol yashiriladi, qatorlari fonda tozalanadi
+    _add_column(cursor, 'tests', 'deleted_at', 'TEXT')
+
+def _create_images_table(cursor):
+    """Images jadvali - rasmlar kontent hash'i bo'yicha bir marta saqlanadi"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS images (
+            hash TEXT PRIMARY KEY,
+            mime_type TEXT NOT NULL,
+            data BLOB NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    migrate_inline_images(cursor)
+
+# Rasm turini birinchi baytlaridan aniqlash (data URL bo'lmagan holatlar uchun)
+_IMAGE_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'RIFF', 'image/webp'),
+]
+
+def decode_image(image_value):
+    """base64 yoki data URL rasmni (bytes, mime_type) ko'rinishiga keltirish
+
+    Noto'g'ri formatda ValueError ko'tariladi.
+    """
+    if not isinstance(image_value, str):
+        raise ValueError("Rasm base64 satr yoki http(s) URL bo'lishi kerak")
+    mime_type = None
+    payload = image_value
+    if image_value.startswith('data:'):
+        header, _, payload = image_value.partition(',')
+        if ';base64' not in header:
+            raise ValueError('Rasm base64 formatida emas')
+        mime_type = header[5:].split(';')[0] or None
     try:
-        cursor.execute('ALTER TABLE tests ADD COLUMN duration_minutes INTEGER')
-    except sqlite3.OperationalError:
-        pass  # Ustun allaqachon mavjud
+        data = base64.b64decode(''.join(payload.split()), validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Rasm base64 formati noto'g'ri")
+    if not data:
+        raise ValueError("Rasm bo'sh")
+    if mime_type is None:
+        mime_type = next(
+            (mime for signature, mime in _IMAGE_SIGNATURES if data.startswith(signature)),
+            'application/octet-stream'
+        )
+    return data, mime_type
+
+def is_image_url(image_value):
+    """Tashqi rasm manzili (http/https) - o'z holicha tests.image da saqlanadi"""
+    return isinstance(image_value, str) and image_value.startswith(('http://', 'https://'))
+
+def prepare_image(image_value):
+    """Rasmni decode qilish va (hash, mime_type, data) qaytarish (tranzaksiyadan tashqarida)"""
+    data, mime_type = decode_image(image_value)
+    return hashlib.sha256(data).hexdigest(), mime_type, data
+
+def store_image(cursor, image):
+    """Rasmni images jadvaliga saqlash va uning hash'ini qaytarish
+
+    image: base64 satr yoki prepare_image() natijasi.
+    """
+    if isinstance(image, str):
+        image = prepare_image(image)
+    image_hash, mime_type, data = image
+    cursor.execute(
+        'INSERT OR IGNORE INTO images (hash, mime_type, data) VALUES (?, ?, ?)',
+        (image_hash, mime_type, data)
+    )
+    return image_hash
+
+def insert_questions(cursor, test_id, questions):
+    """Savollar va javob variantlarini executemany bilan yozish
+
+    questions: [(question_text, correct_answer, [(variant, text), ...]), ...]
+    Savol ID lari oldindan ajratiladi, shuning uchun chaqiruvchi
+    BEGIN IMMEDIATE tranzaksiyasi ichida bo'lishi kerak.
+    """
+    if not questions:
+        return
+    # AUTOINCREMENT: sqlite_sequence dagi eng katta ID dan keyin davom etish
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'questions'")
+    row = cursor.fetchone()
+    last_id = row[0] if row else 0
+    cursor.execute('SELECT MAX(id) FROM questions')
+    last_id = max(last_id, cursor.fetchone()[0] or 0)
+
+    cursor.executemany(
+        'INSERT INTO questions (id, test_id, question_text, correct_answer) VALUES (?, ?, ?, ?)',
+        [
+            (last_id + i, test_id, question_text, correct_answer)
+            for i, (question_text, correct_answer, _answers) in enumerate(questions, start=1)
+        ]
+    )
+    cursor.executemany(
+        'INSERT INTO answers (question_id, variant, text) VALUES (?, ?, ?)',
+        [
+            (last_id + i, variant, text)
+            for i, (_text, _correct, answers) in enumerate(questions, start=1)
+            for variant, text in answers
+        ]
+    )
+
+def delete_image_if_unused(cursor, image_hash):
+    """Hech bir test ishlatmayotgan rasmni o'chirish"""
+    if not image_hash:
+        return
+    cursor.execute(
+        '''
+        DELETE FROM images
+        WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM tests WHERE image_hash = ?)
+        ''',
+        (image_hash, image_hash)
+    )
+
+def migrate_inline_images(cursor):
+    """tests.image dagi eski base64 rasmlarni images jadvaliga ko'chirish"""
+    cursor.execute('SELECT id, image FROM tests WHERE image IS NOT NULL AND image_hash IS NULL')
+    for row in cursor.fetchall():
+        try:
+            image_hash = store_image(cursor, row[1])
+        except ValueError:
+            continue  # URL yoki boshqa qiymat - o'z holicha qoladi
+        cursor.execute(
+            'UPDATE tests SET image_hash = ?, image = NULL WHERE id = ?',
+            (image_hash, row[0])
+        )
+
+# test_stats histogrammasi: 10 ta 10 foizlik oraliq (100% oxirgi oraliqqa kiradi)
+STATS_BUCKETS = 10
+_BUCKET_COLUMNS = [f'bucket_{i}' for i in range(STATS_BUCKETS)]
+
+def score_bucket(score):
+    """Foizni histogramma oralig'i raqamiga aylantirish"""
+    return min(max(int(score // (100 / STATS_BUCKETS)), 0), STATS_BUCKETS - 1)
+
+def rank_bucket_split(stats_row, score):
+    """O'rin hisoblash uchun: (yuqori oraliqlardagi natijalar soni, shu oraliqning yuqori chegarasi)
+
+    Yuqori oraliqlardagi natijalar test_stats histogrammasidan olinadi,
+    shuning uchun COUNT faqat foydalanuvchi balli tushgan oraliqni sanaydi.
+    Oxirgi oraliqning yuqori chegarasi yo'q (cheksiz).
+    """
+    bucket = score_bucket(score)
+    above = sum(
+        (stats_row[col] or 0) if stats_row else 0
+        for col in _BUCKET_COLUMNS[bucket + 1:]
+    )
+    upper = (bucket + 1) * (100 / STATS_BUCKETS) if bucket < STATS_BUCKETS - 1 else float('inf')
+    return above, upper
+
+def create_test_stats_table(cursor):
+    """Har bir test uchun yig'ma statistika jadvali
+
+    submit_test dagi INSERT bilan bitta tranzaksiyada yangilanadi, shuning
+    uchun o'qish natijalar soniga bog'liq emas.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'test_stats'")
+    exists = cursor.fetchone() is not None
+    bucket_defs = ',\n'.join(f'            {col} INTEGER NOT NULL DEFAULT 0' for col in _BUCKET_COLUMNS)
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS test_stats (
+            test_id TEXT PRIMARY KEY,
+            result_count INTEGER NOT NULL DEFAULT 0,
+            score_sum REAL NOT NULL DEFAULT 0,
+            score_sq_sum REAL NOT NULL DEFAULT 0,
+{bucket_defs},
+            FOREIGN KEY (test_id) REFERENCES tests(id)
+        )
+    ''')
+    if exists:
+        return
+    # Mavjud natijalar bo'yicha bir marta to'ldirish
+    bucket_width = 100 / STATS_BUCKETS
+    bucket_sums = ',\n'.join(
+        f'SUM(MIN(MAX(CAST(score / {bucket_width} AS INTEGER), 0), {STATS_BUCKETS - 1}) = {i})'
+        for i in range(STATS_BUCKETS)
+    )
+    cursor.execute(f'''
+        INSERT INTO test_stats (test_id, result_count, score_sum, score_sq_sum, {', '.join(_BUCKET_COLUMNS)})
+        SELECT test_id, COUNT(*), SUM(score), SUM(score * score),
+               {bucket_sums}
+        FROM test_results
+        GROUP BY test_id
+    ''')
+
+def add_test_stats(cursor, rows):
+    """Yangi natijalarni test_stats ga qo'shish (chaqiruvchining tranzaksiyasida)
+
+    rows: (test_id, user_id, score, correct_answers, total_questions)
+    """
+    totals = {}
+    for test_id, _user_id, score, _correct, _total in rows:
+        entry = totals.get(test_id)
+        if entry is None:
+            entry = totals[test_id] = [0, 0.0, 0.0] + [0] * STATS_BUCKETS
+        entry[0] += 1
+        entry[1] += score
+        entry[2] += score * score
+        entry[3 + score_bucket(score)] += 1
+    if not totals:
+        return
+    columns = ['result_count', 'score_sum', 'score_sq_sum'] + _BUCKET_COLUMNS
+    updates = ', '.join(f'{col} = {col} + excluded.{col}' for col in columns)
+    cursor.executemany(
+        f'''
+        INSERT INTO test_stats (test_id, {', '.join(columns)})
+        VALUES ({', '.join('?' * (len(columns) + 1))})
+        ON CONFLICT(test_id) DO UPDATE SET {updates}
+        ''',
+        [(test_id, *entry) for test_id, entry in totals.items()]
+    )
+
+def read_test_stats(row):
+    """test_stats qatoridan API javobini tayyorlash"""
+    count = row['result_count'] if row and row['result_count'] else 0
+    average = row['score_sum'] / count if count else 0
+    variance = (row['score_sq_sum'] / count - average * average) if count else 0
+    bucket_width = 100 / STATS_BUCKETS
+    histogram = []
+    for i, col in enumerate(_BUCKET_COLUMNS):
+        histogram.append({
+            'from': round(i * bucket_width, 2),
+            'to': round((i + 1) * bucket_width, 2),
+            'count': row[col] if row and row[col] is not None else 0
+        })
+    return {
+        'completed': count,
+        'average_score': round(average, 2),
+        'stddev_score': round(max(variance, 0) ** 0.5, 2),
+        'histogram': histogram
+    }
+
+def create_indexes(cursor):
+    """Hot endpoint'lar uchun indekslar va UNIQUE cheklovlarni yaratish"""
+    # Testlar ro'yxati (created_at bo'yicha tartiblangan)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tests_created ON tests(created_at, id)')
+
+    # Testlar ro'yxati filtrlari (sinf va/yoki fan bo'yicha)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tests_class_created
+        ON tests(class_level, created_at, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tests_subject_created
+        ON tests(subject, created_at, id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tests_class_subject_created
+        ON tests(class_level, subject, created_at, id)
+    ''')
+
+    # Ishlatilmayotgan rasmlarni o'chirishda tekshiriladi
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tests_image_hash ON tests(image_hash)')
+    # Tozalanmay qolgan testlarni ishga tushirishda topish uchun (kichik qisman indeks)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tests_deleted
+        ON tests(deleted_at) WHERE deleted_at IS NOT NULL
+    ''')
+
+    # get_test va submit_test: savollar test_id bo'yicha.
+    # correct_answer ham indeksda - baholashda jadvalning o'ziga murojaat qilinmaydi
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_questions_test
+        ON questions(test_id, id, correct_answer)
+    ''')
+
+    # get_test: javob variantlari question_id bo'yicha
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_answers_question ON answers(question_id, id)')
+
+    # Bitta foydalanuvchi testni faqat bir marta ishlaydi.
+    # Eski database larda takroriy natijalar bo'lsa, birinchisi qoldiriladi.
+    cursor.execute('''
+        SELECT 1 FROM sqlite_master
+        WHERE type = 'index' AND name = 'ux_test_results_test_user'
+    ''')
+    if not cursor.fetchone():
+        cursor.execute('''
+            DELETE FROM test_results
+            WHERE id NOT IN (
+                SELECT MIN(id) FROM test_results GROUP BY test_id, user_id
+            )
+        ''')
+        cursor.execute('''
+            CREATE UNIQUE INDEX ux_test_results_test_user
+            ON test_results(test_id, user_id)
+        ''')
+
+    # get_test_results va get_user_results: completed_at bo'yicha tartiblangan
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_test_results_test_completed
+        ON test_results(test_id, completed_at)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_test_results_user_completed
+        ON test_results(user_id, completed_at)
+    ''')
+
+    # Reyting (leaderboard va o'rin): storage.RANK_ORDER bilan bir xil tartib
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_test_results_rank
+        ON test_results(test_id, score DESC, correct_answers DESC, completed_at, id)
+    ''')
+
+# Sxema migratsiyalari: (versiya, tavsif, funksiya).
+# Bajarilgan oxirgi versiya PRAGMA user_version da saqlanadi. Ro'yxatga
+# faqat oxiridan qo'shiladi, mavjud qadamlar o'zgartirilmaydi. Qadamlar
+# idempotent - versiyasiz (user_version = 0) eski database larda ham
+# xavfsiz bajariladi.
+MIGRATIONS = [
+    (1, 'asosiy jadvallar', _create_base_tables),
+    (2, 'tests ustunlari', _add_test_columns),
+    (3, 'images jadvali', _create_images_table),
+    # Indekslar test_stats dan oldin: UNIQUE indeks takroriy natijalarni
+    # o'chiradi, statistika esa qolgan natijalardan hisoblanadi
+    (4, 'indekslar', create_indexes),
+    (5, 'test_stats', create_test_stats_table),
+    (6, 'id_allocator', create_id_allocator_table),
+    (7, 'catalog_version', create_catalog_version_table),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def run_migrations(conn):
+    """Bajarilmagan migratsiyalarni tartib bilan, har birini o'z tranzaksiyasida bajarish"""
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    applied = 0
+    for version, description, migration in MIGRATIONS:
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            # Lock olingandan keyin qayta o'qiladi - boshqa jarayon bajargan bo'lishi mumkin
+            cursor.execute('PRAGMA user_version')
+            if cursor.fetchone()[0] >= version:
+                conn.rollback()
+                continue
+            step_started = time.perf_counter()
+            migration(cursor)
+            cursor.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied += 1
+        print(f"Migratsiya {version} ({description}): {(time.perf_counter() - step_started) * 1000:.1f} ms")
+    if applied:
+        print(f"Sxema {SCHEMA_VERSION}-versiyaga keltirildi: {applied} ta migratsiya, "
+              f"{(time.perf_counter() - started) * 1000:.1f} ms")
+
+def init_db():
+    """Database sxemasini joriy versiyaga keltirish
+
+    Sxema joriy bo'lsa, faqat bitta PRAGMA o'qiladi.
+    """
+    conn = get_db()
     try:
-        cursor.execute('ALTER TABLE tests ADD COLUMN subject TEXT')
-    except sqlite3.OperationalError:
-        pass  # Ustun allaqachon mavjud
-    
-    conn.commit()
-    conn.close()
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < SCHEMA_VERSION:
+            run_migrations(conn)
+        elif version > SCHEMA_VERSION:
+            print(f"Ogohlantirish: database sxemasi ({version}) koddan ({SCHEMA_VERSION}) yangiroq")
+    finally:
+        conn.close()
 
 # Database yaratish - faqat local development uchun
 # Vercel'da bu qator o'chiriladi yoki cloud database ishlatiladi
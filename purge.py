@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+
+import models_simple
+
+def purge_batch(conn, test_id, batch_size):
+    """O'chirilgan testning bir bo'lagini qisqa tranzaksiyada tozalash
+
+    Avval natijalar, keyin savollar (javoblari bilan) batch_size tadan
+    o'chiriladi. Hammasi tozalangach test qatori va rasm o'chiriladi.
+    Test to'liq tozalangan bo'lsa True qaytaradi.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute(
+            '''
+            DELETE FROM test_results WHERE id IN (
+                SELECT id FROM test_results WHERE test_id = ? LIMIT ?
+            )
+            ''',
+            (test_id, batch_size)
+        )
+        if cursor.rowcount > 0:
+            conn.commit()
+            return False
+
+        # Javoblar savollar bilan bir xil to'plam bo'yicha o'chiriladi
+        question_batch = 'SELECT id FROM questions WHERE test_id = ? ORDER BY id LIMIT ?'
+        cursor.execute(
+            f'DELETE FROM answers WHERE question_id IN ({question_batch})',
+            (test_id, batch_size)
+        )
+        cursor.execute(
+            f'DELETE FROM questions WHERE id IN ({question_batch})',
+            (test_id, batch_size)
+        )
+        if cursor.rowcount > 0:
+            conn.commit()
+            return False
+
+        cursor.execute('SELECT image_hash FROM tests WHERE id = ?', (test_id,))
+        test = cursor.fetchone()
+        cursor.execute('DELETE FROM test_stats WHERE test_id = ?', (test_id,))
+        cursor.execute(
+            'DELETE FROM tests WHERE id = ? AND deleted_at IS NOT NULL',
+            (test_id,)
+        )
+        if test:
+            models_simple.delete_image_if_unused(cursor, test['image_hash'])
+        conn.commit()
+        return True
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+class TestPurger:
+    """O'chirilgan testlarni fonda bo'laklab tozalovchi thread
+
+    delete_test testni faqat yashiradi (deleted_at). Ko'p natijali testning
+    qatorlari bu yerda batch_size tadan, har biri alohida qisqa
+    tranzaksiyada o'chiriladi - boshqa testlarga yozish to'xtab qolmaydi.
+
+    batch - (test_id, batch_size) -> tozalab bo'lindimi; berilmasa
+    models_simple database idagi purge_batch ishlatiladi.
+    """
+
+    def __init__(self, batch_size=500, pause_ms=10, retry_base=1, retry_max=300, enabled=True,
+                 batch=None):
+        self.enabled = enabled
+        self.batch = batch
+        self.batch_size = batch_size
+        self.pause = pause_ms / 1000
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._pending = []
+        self._failures = {}  # test_id -> ketma-ket xatolar soni
+        self._retry_at = {}  # test_id -> keyingi urinish vaqti (monotonic)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.purged = 0
+        self.errors = 0
+
+    def _ensure_thread(self):
+        # Gunicorn fork qilgandan keyin thread yangi jarayonda qayta ishga tushiriladi
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name='test-purger', daemon=True
+            )
+            self._thread.start()
+
+    def schedule(self, test_id):
+        """Yashirilgan testni tozalash navbatiga qo'yish"""
+        if not self.enabled:
+            # Fon thread o'chirilgan - so'rov thread'ida bo'laklab tozalash.
+            # O'chirish allaqachon commit qilingan: xato so'rovni buzmaydi,
+            # test yashirin holda qoladi va schedule_pending (keyingi ishga
+            # tushirish) uni qayta tozalaydi.
+            try:
+                self.purge(test_id)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"Test purge error ({test_id}, keyingi ishga tushirishda qayta): {e}")
+            return
+        with self._lock:
+            if test_id not in self._pending:
+                self._pending.append(test_id)
+        self._ensure_thread()
+        self._wakeup.set()
+
+    def schedule_pending(self, cursor):
+        """Oldingi ishga tushirishda tozalanmay qolgan testlarni navbatga qo'yish"""
+        cursor.execute('SELECT id FROM tests WHERE deleted_at IS NOT NULL')
+        for row in cursor.fetchall():
+            self.schedule(row['id'])
+
+    def purge(self, test_id):
+        """Bitta testni to'liq tozalaguncha batch larni bajarish"""
+        if self.batch is not None:
+            self._purge_batches(lambda: self.batch(test_id, self.batch_size))
+            return
+        conn = models_simple.get_db()
+        try:
+            self._purge_batches(lambda: purge_batch(conn, test_id, self.batch_size))
+        finally:
+            conn.close()
+
+    def _purge_batches(self, run_batch):
+        while True:
+            done = run_batch()
+            with self._lock:
+                self.batches += 1
+            if done:
+                break
+            # Navbatdagi yozuvchilarga (result_writer) yo'l berish
+            time.sleep(self.pause)
+        with self._lock:
+            self.purged += 1
+
+    def _run(self):
+        while True:
+            now = time.monotonic()
+            timeout = None
+            with self._lock:
+                test_id = next(
+                    (t for t in self._pending if self._retry_at.get(t, 0) <= now), None
+                )
+                if test_id is None:
+                    # Navbat bo'sh yoki hamma testlar backoff da - yangi test
+                    # yoki eng yaqin qayta urinish vaqtigacha kutish
+                    self._wakeup.clear()
+                    if self._pending:
+                        timeout = min(self._retry_at[t] for t in self._pending) - now
+            if test_id is None:
+                self._wakeup.wait(timeout)
+                continue
+            try:
+                self.purge(test_id)
+            except Exception as e:
+                self._failed(test_id, e)
+                continue
+            with self._lock:
+                self._pending.remove(test_id)
+                self._failures.pop(test_id, None)
+                self._retry_at.pop(test_id, None)
+
+    def _failed(self, test_id, error):
+        """Xato bergan testni navbat oxiriga o'tkazish, keyingi urinishni kechiktirish
+
+        Kechikish har xatoda ikki barobar oshadi (retry_max gacha), shuning
+        uchun bitta buzilgan test boshqa testlarning tozalanishini to'xtatmaydi.
+        """
+        with self._lock:
+            self.errors += 1
+            failures = self._failures.get(test_id, 0) + 1
+            self._failures[test_id] = failures
+            delay = min(self.retry_base * 2 ** (failures - 1), self.retry_max)
+            self._retry_at[test_id] = time.monotonic() + delay
+            self._pending.remove(test_id)
+            self._pending.append(test_id)
+        print(f"Test purge error ({test_id}, {failures}-urinish, {delay:g}s dan keyin qayta): {error}")
+
+    def stats(self):
+        """Tozalovchi statistikasi (monitoring uchun)"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'batch_size': self.batch_size,
+                'pending': len(self._pending),
+                'retrying': len(self._failures),
+                'batches': self.batches,
+                'purged': self.purged,
+                'errors': self.errors,
+            }
+
+test_purger = TestPurger(
+    batch_size=int(os.environ.get('TEST_PURGE_BATCH_SIZE', 500)),
+    pause_ms=float(os.environ.get('TEST_PURGE_PAUSE_MS', 10)),
+    enabled=os.environ.get('TEST_PURGER_ENABLED', '1') != '0',
+)
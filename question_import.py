@@ -0,0 +1,184 @@
+"""Savollar bankini oqim (stream) ko'rinishida o'qish
+
+So'rov tanasi xotiraga to'liq yuklanmaydi: CSV va NDJSON qatorma-qator,
+JSON massiv esa element-ma-element o'qiladi. Har bir savol
+(question_text, correct_answer, [(variant, text), ...]) ko'rinishiga keltiriladi.
+"""
+import codecs
+import csv
+import io
+import json
+
+# JSON massivni o'qishda bir martada o'qiladigan bayt soni
+CHUNK_SIZE = 64 * 1024
+
+# Bitta JSON massiv elementining eng katta hajmi (belgi) - undan oshsa,
+# element buzilgan deb hisoblanadi va tana oxirigacha o'qilmaydi
+MAX_ELEMENT_SIZE = 1024 * 1024
+
+# JSON xatoligidan keyin shuncha belgi bo'lsa, bu kesilgan element emas
+# (tugallanmagan true/false/null yoki son bundan qisqa)
+_TRUNCATION_SLACK = 16
+
+class QuestionImportError(ValueError):
+    """Import faylidagi xatolik (qator raqami bilan)"""
+
+def normalize_question(q_data):
+    """create_test formatidagi savolni tuple ga aylantirish
+
+    Matni yoki javob variantlari bo'lmagan savol uchun None qaytaradi.
+    """
+    if not isinstance(q_data, dict):
+        return None
+    question_text = q_data.get('question_text')
+    answers = q_data.get('answers') or []
+    correct_answer = q_data.get('correct_answer') or 'A'
+    if not question_text or not answers:
+        return None
+    answer_rows = []
+    for ans_data in answers:
+        if not isinstance(ans_data, dict):
+            continue
+        variant = ans_data.get('variant')
+        text = ans_data.get('text')
+        if variant is None or text is None:
+            continue
+        answer_rows.append((str(variant), str(text)))
+    if not answer_rows:
+        return None
+    return (str(question_text), str(correct_answer), answer_rows)
+
+def _decode_lines(stream, encoding='utf-8'):
+    """Tanani qatorma-qator dekodlash (qator raqami bilan xatolik uchun)
+
+    TextIOWrapper katta bo'laklarni dekodlaydi va xato qaysi qatorda
+    ekanini bildirmaydi, shuning uchun har bir qator alohida dekodlanadi.
+    """
+    if not isinstance(stream, io.BufferedIOBase):
+        stream = io.BufferedReader(stream, CHUNK_SIZE)
+    for line_number, raw_line in enumerate(stream, start=1):
+        try:
+            yield raw_line.decode(encoding)
+        except UnicodeDecodeError:
+            raise QuestionImportError(f"{line_number}-qatorda UTF-8 xatoligi")
+        # BOM faqat birinchi qatorda bo'lishi mumkin
+        encoding = 'utf-8'
+
+def iter_csv_questions(stream):
+    """CSV: question_text, correct_answer ustunlari va har bir variant uchun ustun
+
+    Masalan: question_text,correct_answer,A,B,C,D
+    """
+    reader = csv.DictReader(_decode_lines(stream, 'utf-8-sig'))
+    try:
+        fieldnames = reader.fieldnames
+    except csv.Error as e:
+        raise QuestionImportError(f"1-qatorda CSV xatoligi: {e}")
+    if not fieldnames or 'question_text' not in fieldnames:
+        raise QuestionImportError("CSV sarlavhasida question_text ustuni bo'lishi kerak")
+    variants = [f for f in fieldnames if f not in ('question_text', 'correct_answer')]
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            # DictReader.line_num faqat muvaffaqiyatli yozuvdan keyin yangilanadi
+            raise QuestionImportError(f"{reader.reader.line_num}-qatorda CSV xatoligi: {e}")
+        question = normalize_question({
+            'question_text': row.get('question_text'),
+            'correct_answer': row.get('correct_answer'),
+            'answers': [
+                {'variant': variant, 'text': row[variant]}
+                for variant in variants if row.get(variant)
+            ]
+        })
+        if question:
+            yield question
+
+def iter_ndjson_questions(stream):
+    """NDJSON: har bir qatorda bitta savol (create_test formatida)"""
+    for line_number, line in enumerate(_decode_lines(stream), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            q_data = json.loads(line)
+        except ValueError:
+            raise QuestionImportError(f"{line_number}-qatorda JSON xatoligi")
+        question = normalize_question(q_data)
+        if question:
+            yield question
+
+def iter_json_array_questions(stream):
+    """JSON massiv: [{...}, {...}] - elementlar birma-bir o'qiladi
+
+    Buzilgan element darhol xatolik beradi: xato joyidan keyin yana
+    ma'lumot bo'lsa yoki element MAX_ELEMENT_SIZE dan oshsa, tananing
+    qolgan qismi o'qilmaydi.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        # Bo'sh joy va ajratgichlarni o'tkazib yuborish
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise QuestionImportError("JSON massiv kutilgan edi")
+            started = True
+            position += 1
+            continue
+        if started and position < len(buffer) and buffer[position] == ']':
+            return
+        if position < len(buffer):
+            try:
+                q_data, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise QuestionImportError("JSON massiv noto'g'ri yoki tugallanmagan")
+                # Kesilgan element xatosi bufer oxirida bo'ladi (uzun satr bundan
+                # mustasno - uni hajm chegarasi ushlaydi)
+                if (len(buffer) - e.pos > _TRUNCATION_SLACK
+                        and not e.msg.startswith('Unterminated string')):
+                    raise QuestionImportError(f"JSON massiv elementida xatolik: {e.msg}")
+                if len(buffer) - position > MAX_ELEMENT_SIZE:
+                    raise QuestionImportError(
+                        f"JSON massiv elementi {MAX_ELEMENT_SIZE} belgidan katta yoki buzilgan"
+                    )
+                q_data = None
+            if q_data is not None:
+                position = end
+                question = normalize_question(q_data)
+                if question:
+                    yield question
+                continue
+        elif eof:
+            raise QuestionImportError("JSON massiv tugallanmagan")
+
+        # Ko'proq ma'lumot o'qish (ishlatilgan qismini tashlab)
+        chunk = stream.read(CHUNK_SIZE)
+        try:
+            buffer = buffer[position:] + utf8.decode(chunk or b'', final=not chunk)
+        except UnicodeDecodeError:
+            raise QuestionImportError("JSON massivda UTF-8 xatoligi")
+        position = 0
+        eof = not chunk
+
+def iter_questions(stream, content_type):
+    """Content-Type bo'yicha mos o'quvchini tanlash"""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('text/csv', 'application/csv'):
+        return iter_csv_questions(stream)
+    if content_type in ('application/x-ndjson', 'application/jsonl', 'application/ndjson'):
+        return iter_ndjson_questions(stream)
+    if content_type == 'application/json':
+        return iter_json_array_questions(stream)
+    raise QuestionImportError(
+        "Content-Type text/csv, application/x-ndjson yoki application/json bo'lishi kerak"
+    )
@@ -0,0 +1,251 @@
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import models_simple
+
+class PendingResult:
+    """Navbatdagi bitta natija va uni kutayotgan so'rov uchun signal"""
+    __slots__ = ('row', 'result_id', 'created', 'error', 'done', 'on_done')
+
+    def __init__(self, row):
+        # row: (test_id, user_id, score, correct_answers, total_questions)
+        self.row = row
+        self.result_id = None
+        self.created = False
+        self.error = None
+        self.done = threading.Event()
+        self.on_done = None  # submit_async: event loop ga xabar berish
+
+    def finish(self):
+        self.done.set()
+        if self.on_done is not None:
+            self.on_done()
+
+# ux_test_results_test_user buzilganda SQLite xabari (indeks nomi emas, ustunlar)
+DUPLICATE_RESULT_ERROR = 'UNIQUE constraint failed: test_results.test_id, test_results.user_id'
+
+def is_duplicate_result(error):
+    """IntegrityError (test_id, user_id) takrorlanishidan kelib chiqqanmi"""
+    return str(error) == DUPLICATE_RESULT_ERROR
+
+def write_batch(conn, items):
+    """Natijalarni bitta tranzaksiyada yozish (har bir natija alohida SAVEPOINT da)
+
+    Takroriy (test_id, user_id) uchun yangi qator yozilmaydi - mavjud
+    natija ID si qaytariladi (created=False). Test o'chirilgan yoki mavjud
+    bo'lmasa, natija yozilmaydi va item.error = LookupError - aks holda
+    tozalangan test uchun yetim natija va test_stats qatori paydo bo'ladi.
+    """
+    cursor = conn.cursor()
+    try:
+        if not conn.in_transaction:
+            cursor.execute('BEGIN IMMEDIATE')
+        # BEGIN IMMEDIATE ichida - delete_test/purge bilan poyga yo'q
+        test_ids = list({item.row[0] for item in items})
+        placeholders = ', '.join('?' * len(test_ids))
+        cursor.execute(
+            f'SELECT id FROM tests WHERE id IN ({placeholders}) AND deleted_at IS NULL',
+            test_ids
+        )
+        live_tests = {row[0] for row in cursor.fetchall()}
+        for item in items:
+            if item.row[0] not in live_tests:
+                item.error = LookupError('Test topilmadi')
+                continue
+            # Har bir natija o'z SAVEPOINT ida: bitta noto'g'ri natija faqat
+            # o'zini qaytaradi, batch dagi boshqa o'quvchilar commit qilinadi
+            cursor.execute('SAVEPOINT result_item')
+            try:
+                cursor.execute(
+                    '''INSERT INTO test_results (test_id, user_id, score, correct_answers, total_questions)
+                       VALUES (?, ?, ?, ?, ?)''',
+                    item.row
+                )
+                item.result_id = cursor.lastrowid
+                item.created = True
+            except sqlite3.Error as e:
+                cursor.execute('ROLLBACK TO result_item')
+                item.error = e
+                # Faqat ux_test_results_test_user buzilishi takroriy natija;
+                # NOT NULL va boshqa cheklovlar shu item xatosi bo'lib qoladi
+                if isinstance(e, sqlite3.IntegrityError) and is_duplicate_result(e):
+                    cursor.execute(
+                        'SELECT id FROM test_results WHERE test_id = ? AND user_id = ?',
+                        item.row[:2]
+                    )
+                    existing = cursor.fetchone()
+                    if existing is not None:
+                        item.result_id = existing[0]
+                        item.error = None
+            finally:
+                cursor.execute('RELEASE result_item')
+        # Yig'ma statistika shu tranzaksiyada yangilanadi
+        models_simple.add_test_stats(cursor, [item.row for item in items if item.created])
+        conn.commit()
+    except Exception as e:
+        if conn.in_transaction:
+            conn.rollback()
+        for item in items:
+            item.result_id = None
+            item.created = False
+            item.error = e
+
+class ResultWriter:
+    """Natijalarni guruhlab yozuvchi (group commit) fon thread
+
+    So'rov thread'lari natijani navbatga qo'yadi va kutadi. Writer thread
+    batch_size tagacha natijani yoki max_wait_ms o'tguncha yig'adi, so'ng
+    ularni bitta tranzaksiyada yozib, har bir so'rovga result_id qaytaradi.
+    """
+
+    def __init__(self, batch_size=64, max_wait_ms=5, timeout=30, enabled=True):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.written = 0
+        self.duplicates = 0
+        self.largest_batch = 0
+
+    def _ensure_thread(self):
+        # Gunicorn fork qilgandan keyin thread yangi jarayonda qayta ishga tushiriladi
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name='result-writer', daemon=True
+            )
+            self._thread.start()
+
+    def submit(self, test_id, user_id, score, correct_answers, total_questions):
+        """Natijani navbatga qo'yish va yozilishini kutish
+
+        (result_id, created) qaytaradi. created=False bo'lsa, foydalanuvchi
+        bu testni allaqachon ishlagan va result_id - oldingi natija.
+        """
+        item = PendingResult((test_id, user_id, score, correct_answers, total_questions))
+        if not self.enabled:
+            # Fon thread o'chirilgan - so'rov thread'ida darhol yozish
+            self._write([item])
+            if item.error is not None:
+                raise item.error
+            return item.result_id, item.created
+        self._ensure_thread()
+        self._queue.put(item)
+        if not item.done.wait(self.timeout):
+            raise Exception('Natijani saqlash vaqti tugadi')
+        if item.error is not None:
+            raise item.error
+        return item.result_id, item.created
+
+    async def submit_async(self, test_id, user_id, score, correct_answers, total_questions,
+                           executor=None):
+        """submit() ning asyncio varianti
+
+        Natija yozilishini kutish paytida hech qanday thread band
+        qilinmaydi - writer thread tayyor bo'lganda future ni bajaradi.
+        """
+        item = PendingResult((test_id, user_id, score, correct_answers, total_questions))
+        loop = asyncio.get_running_loop()
+        if not self.enabled:
+            await loop.run_in_executor(executor, self._write, [item])
+        else:
+            future = loop.create_future()
+
+            def wake():
+                if not future.done():
+                    future.set_result(None)
+
+            def notify():
+                try:
+                    loop.call_soon_threadsafe(wake)
+                except RuntimeError:
+                    pass  # Event loop yopilgan - kutayotgan so'rov yo'q
+
+            item.on_done = notify
+            self._ensure_thread()
+            self._queue.put(item)
+            try:
+                await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                raise Exception('Natijani saqlash vaqti tugadi')
+        if item.error is not None:
+            raise item.error
+        return item.result_id, item.created
+
+    def _collect(self):
+        """Bitta batch yig'ish: birinchi natijani kutish, keyin max_wait gacha qo'shish"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self._write(batch)
+            for item in batch:
+                item.finish()
+
+    def _write(self, batch):
+        """Batch ni yozish va statistikani yangilash"""
+        try:
+            conn = models_simple.get_db()
+            try:
+                write_batch(conn, batch)
+            finally:
+                conn.close()
+        except Exception as e:
+            for item in batch:
+                item.error = e
+        with self._lock:
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, len(batch))
+            for item in batch:
+                if item.created:
+                    self.written += 1
+                elif item.error is None:
+                    self.duplicates += 1
+
+    def stats(self):
+        """Writer statistikasi (monitoring uchun)"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'batch_size': self.batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'queued': self._queue.qsize(),
+                'batches': self.batches,
+                'written': self.written,
+                'duplicates': self.duplicates,
+                'largest_batch': self.largest_batch,
+                'avg_batch': round(
+                    (self.written + self.duplicates) / self.batches, 2
+                ) if self.batches else 0,
+            }
+
+result_writer = ResultWriter(
+    batch_size=int(os.environ.get('RESULT_WRITER_BATCH_SIZE', 64)),
+    max_wait_ms=float(os.environ.get('RESULT_WRITER_MAX_WAIT_MS', 5)),
+    enabled=os.environ.get('RESULT_WRITER_ENABLED', '1') != '0',
+)
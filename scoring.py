@@ -0,0 +1,100 @@
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+import os
+
+from cache import LRUCache
+
+Score = namedtuple('Score', ['correct_answers', 'total_questions', 'score'])
+
+class AnswerKey:
+    """Testning bir marta kompilyatsiya qilingan javoblar kaliti
+
+    Savol ID lari saralangan array('q') da, to'g'ri javoblar (katta harfda)
+    shu tartibdagi tuple da saqlanadi. Savol bisect orqali topiladi.
+    """
+    __slots__ = ('test_id', 'question_ids', 'correct')
+
+    def __init__(self, test_id, rows):
+        # rows: (question_id, correct_answer) - id bo'yicha saralangan
+        self.test_id = test_id
+        self.question_ids = array('q', (row[0] for row in rows))
+        self.correct = tuple(str(row[1]).upper() for row in rows)
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    def score(self, answers):
+        """Bitta yuborilgan javoblarni baholash
+
+        answers: {question_id: javob} lug'ati (to_answer_map natijasi).
+        Javoblar ustidan bir marta o'tiladi.
+        """
+        question_ids = self.question_ids
+        correct = self.correct
+        total = len(question_ids)
+        correct_answers = 0
+        for question_id, answer in answers.items():
+            i = bisect_left(question_ids, question_id)
+            if i < total and question_ids[i] == question_id and answer.upper() == correct[i]:
+                correct_answers += 1
+        score = (correct_answers / total * 100) if total > 0 else 0
+        return Score(correct_answers, total, score)
+
+    def score_many(self, submissions):
+        """Ko'p yuborilgan javoblarni bitta kalit bilan baholash
+
+        Masalan, kalit tuzatilgandan keyin butun testni qayta baholash uchun.
+        """
+        score = self.score
+        return [score(answers) for answers in submissions]
+
+def to_answer_map(answers):
+    """[{'question_id': ..., 'answer': ...}] ro'yxatini {question_id: javob} ga aylantirish
+
+    Bir savolga bir necha javob kelsa, birinchisi hisobga olinadi.
+    Noto'g'ri yozuvlar e'tiborsiz qoldiriladi.
+    """
+    answer_map = {}
+    for item in answers or []:
+        if not isinstance(item, dict):
+            continue
+        answer = item.get('answer')
+        if not answer or not isinstance(answer, str):
+            continue
+        try:
+            question_id = int(item.get('question_id'))
+        except (TypeError, ValueError):
+            continue
+        answer_map.setdefault(question_id, answer)
+    return answer_map
+
+# Kompilyatsiya qilingan kalitlar keshi (test_id -> AnswerKey)
+_answer_keys = LRUCache(maxsize=int(os.environ.get('ANSWER_KEY_CACHE_SIZE', 512)))
+
+def compile_answer_key(cursor, test_id):
+    """Javoblar kalitini database dan o'qib kompilyatsiya qilish"""
+    cursor.execute(
+        'SELECT id, correct_answer FROM questions WHERE test_id = ? ORDER BY id',
+        (test_id,)
+    )
+    return AnswerKey(test_id, cursor.fetchall())
+
+def cached_answer_key(test_id, compile_key):
+    """Javoblar kalitini keshdan olish, bo'lmasa compile_key() bilan yaratish"""
+    key = _answer_keys.get(test_id)
+    if key is None:
+        key = compile_key()
+        _answer_keys.set(test_id, key)
+    return key
+
+def get_answer_key(cursor, test_id):
+    """Javoblar kalitini keshdan yoki database dan olish"""
+    return cached_answer_key(test_id, lambda: compile_answer_key(cursor, test_id))
+
+def invalidate_answer_key(test_id):
+    """Test o'chirilganda yoki kalit tuzatilganda keshdan chiqarish"""
+    _answer_keys.pop(test_id)
+
+def answer_key_cache_stats():
+    return _answer_keys.stats()
@@ -0,0 +1,231 @@
+"""Katta hajmdagi sintetik ma'lumot yaratish (scale test uchun)
+
+models_simple.init_db sxemasi ustiga testlar, savollar, javob variantlari,
+foydalanuvchilar va natijalarni executemany bilan katta bo'laklarda
+yozadi. Test mashhurligi Zipf taqsimotiga, o'quvchi bilimi Beta
+taqsimotiga bo'ysunadi - natijalar haqiqiy imtihonlarga o'xshaydi.
+
+Ishlatish:
+    python seed_data.py --db katta.db
+    python seed_data.py --db katta.db --tests 20000 --users 200000 --results 3000000
+    python seed_data.py --db kichik.db --tests 200 --users 2000 --results 20000
+
+So'ng: python check_query_plans.py katta.db, python benchmark.py --db katta.db
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import models_simple
+from id_allocator import allocate_test_id
+from catalog import bump_catalog_version
+
+FIRST_NAMES = [
+    'Aziz', 'Bekzod', 'Dilnoza', 'Gulnora', 'Jasur', 'Kamola', 'Laylo', 'Madina',
+    'Nodir', 'Otabek', 'Rustam', 'Sardor', 'Shahlo', 'Sevara', 'Timur', 'Umida',
+    'Zarina', 'Javohir', 'Malika', 'Sherzod', 'Nilufar', 'Akmal', 'Feruza', 'Islom',
+]
+LAST_NAMES = [
+    'Karimov', 'Rahimova', 'Tursunov', 'Yusupova', 'Aliyev', 'Ergasheva', 'Nazarov',
+    'Saidova', 'Qodirov', 'Xolmatova', 'Usmonov', 'Mirzayeva', 'Abdullayev', 'Hasanova',
+]
+SUBJECTS = ['Matematika', 'Algebra', 'Geometriya', 'Fizika', 'Informatika', 'Ingliz tili']
+CLASS_LEVELS = [f'{n}-sinf' for n in range(5, 12)]
+VARIANTS = 'ABCD'
+
+def log(message, started):
+    print(f"[{time.perf_counter() - started:8.1f}s] {message}")
+
+def timestamp(rng, now, days):
+    """Oxirgi `days` kun ichidagi tasodifiy vaqt (CURRENT_TIMESTAMP formatida)"""
+    moment = now - timedelta(seconds=rng.randrange(days * 86400))
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+def popularity_counts(total, tests, exponent, users):
+    """Har bir test uchun natijalar soni (Zipf: k-test ~ 1 / k^exponent)
+
+    Bitta testni users dan ortiq o'quvchi yecha olmaydi - ortib qolgani
+    qolgan testlarga shu nisbatda taqsimlanadi.
+    """
+    weights = [1 / (rank ** exponent) for rank in range(1, tests + 1)]
+    counts = [0] * tests
+    open_tests = list(range(tests))
+    remaining = total
+    while remaining > 0 and open_tests:
+        weight_sum = sum(weights[i] for i in open_tests)
+        still_open = []
+        for i in open_tests:
+            counts[i] += int(round(remaining * weights[i] / weight_sum))
+            if counts[i] >= users:
+                counts[i] = users
+            else:
+                still_open.append(i)
+        remaining = total - sum(counts)
+        if len(still_open) == len(open_tests):
+            break  # Yaxlitlash qoldig'i
+        open_tests = still_open
+    return counts
+
+def seed_users(cursor, rng, users, prefix):
+    rows = (
+        (f'{prefix}{i}', f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}')
+        for i in range(users)
+    )
+    cursor.executemany('INSERT OR IGNORE INTO users (id, name) VALUES (?, ?)', rows)
+
+def seed_tests(conn, rng, args, now, started):
+    """Testlar, savollar va javoblar; [(test_id, savollar soni), ...] qaytaradi"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'questions'")
+    row = cursor.fetchone()
+    next_question_id = (row[0] if row else 0) + 1
+    cursor.execute('SELECT MAX(id) FROM questions')
+    next_question_id = max(next_question_id, (cursor.fetchone()[0] or 0) + 1)
+
+    tests = []
+    answers_total = 0
+    for chunk_start in range(0, args.tests, args.chunk):
+        chunk_size = min(args.chunk, args.tests - chunk_start)
+        test_rows, question_rows, answer_rows = [], [], []
+        cursor.execute('BEGIN IMMEDIATE')
+        for _ in range(chunk_size):
+            test_id = allocate_test_id(cursor)
+            count = max(1, int(rng.gauss(args.questions, args.questions_spread)))
+            test_rows.append((
+                test_id, f'{rng.choice(SUBJECTS)} testi #{len(tests) + 1}',
+                rng.choice(CLASS_LEVELS), rng.choice((None, 20, 30, 45, 60, 90)),
+                rng.choice(SUBJECTS), timestamp(rng, now, args.days)
+            ))
+            for q in range(count):
+                correct = rng.choice(VARIANTS)
+                question_rows.append((
+                    next_question_id, test_id,
+                    f'{q + 1}-savol: {rng.randint(2, 999)} + {rng.randint(2, 999)} = ?', correct
+                ))
+                for variant in VARIANTS:
+                    answer_rows.append((next_question_id, variant, str(rng.randint(4, 1998))))
+                next_question_id += 1
+            tests.append((test_id, count))
+        cursor.executemany(
+            '''INSERT INTO tests (id, name, class_level, duration_minutes, subject, created_at)
+               VALUES (?, ?, ?, ?, ?, ?)''',
+            test_rows
+        )
+        cursor.executemany(
+            'INSERT INTO questions (id, test_id, question_text, correct_answer) VALUES (?, ?, ?, ?)',
+            question_rows
+        )
+        cursor.executemany(
+            'INSERT INTO answers (question_id, variant, text) VALUES (?, ?, ?)',
+            answer_rows
+        )
+        conn.commit()
+        answers_total += len(answer_rows)
+        log(f"testlar: {len(tests)}/{args.tests}, javob variantlari: {answers_total}", started)
+    return tests
+
+def seed_results(conn, rng, args, tests, prefix, now, started):
+    """Natijalar va test_stats; har bir (test, o'quvchi) juftligi bir marta"""
+    cursor = conn.cursor()
+    counts = popularity_counts(args.results, len(tests), args.popularity, args.users)
+    order = list(range(len(tests)))
+    rng.shuffle(order)  # Eng mashhur testlar ro'yxat boshida bo'lmasin
+
+    # O'quvchi bilimi: Beta(a, b) - o'rtacha a / (a + b)
+    ability = [rng.betavariate(args.ability_a, args.ability_b) for _ in range(args.users)]
+    written = 0
+    batch = []
+    for test_index, count in zip(order, counts):
+        if count == 0:
+            continue
+        test_id, total = tests[test_index]
+        for user_index in rng.sample(range(args.users), count):
+            p = ability[user_index]
+            correct = sum(1 for _ in range(total) if rng.random() < p)
+            batch.append((
+                test_id, f'{prefix}{user_index}', correct / total * 100, correct, total,
+                timestamp(rng, now, args.days)
+            ))
+        if len(batch) >= args.chunk * 50:
+            written += flush_results(conn, batch)
+            batch = []
+            log(f"natijalar: {written}/{args.results}", started)
+    if batch:
+        written += flush_results(conn, batch)
+        log(f"natijalar: {written}/{args.results}", started)
+    return written
+
+def flush_results(conn, batch):
+    """Natijalarni yozish - test_stats ga faqat haqiqatda qo'shilganlari kiradi
+
+    INSERT OR IGNORE takroriy (test_id, user_id) ni tashlab yuboradi, shuning
+    uchun qatorlar birma-bir yoziladi va rowcount tekshiriladi.
+    """
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    inserted = []
+    for row in batch:
+        cursor.execute(
+            '''INSERT OR IGNORE INTO test_results
+               (test_id, user_id, score, correct_answers, total_questions, completed_at)
+               VALUES (?, ?, ?, ?, ?, ?)''',
+            row
+        )
+        if cursor.rowcount == 1:
+            inserted.append(row[:5])
+    models_simple.add_test_stats(cursor, inserted)
+    conn.commit()
+    return len(inserted)
+
+def main():
+    parser = argparse.ArgumentParser(description="Sintetik ma'lumot yaratish")
+    parser.add_argument('--db', default='seed.db', help='Database fayli (standart: seed.db)')
+    parser.add_argument('--tests', type=int, default=20000)
+    parser.add_argument('--questions', type=float, default=25, help="Testdagi o'rtacha savollar soni")
+    parser.add_argument('--questions-spread', type=float, default=8, help='Savollar soni standart og\'ishi')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--results', type=int, default=2000000)
+    parser.add_argument('--popularity', type=float, default=1.0, help='Zipf ko\'rsatkichi (test mashhurligi)')
+    parser.add_argument('--ability-a', type=float, default=5.0, help="O'quvchi bilimi Beta(a, b)")
+    parser.add_argument('--ability-b', type=float, default=3.0)
+    parser.add_argument('--days', type=int, default=365, help='Vaqt oralig\'i (kun)')
+    parser.add_argument('--chunk', type=int, default=1000, help='Bitta tranzaksiyadagi testlar soni')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rng = random.Random(args.seed)
+    # CURRENT_TIMESTAMP kabi UTC da
+    now = datetime.now(timezone.utc)
+    prefix = f'seed{args.seed}-'
+
+    models_simple.DB_NAME = args.db
+    models_simple.init_db()
+    conn = models_simple.get_db()
+    # Faqat yaratish paytida: fsync siz (jarayon yiqilsa fayl qayta yaratiladi)
+    conn.execute('PRAGMA synchronous=OFF')
+
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    seed_users(cursor, rng, args.users, prefix)
+    conn.commit()
+    log(f"foydalanuvchilar: {args.users}", started)
+
+    tests = seed_tests(conn, rng, args, now, started)
+    written = seed_results(conn, rng, args, tests, prefix, now, started)
+
+    cursor.execute('BEGIN IMMEDIATE')
+    bump_catalog_version(cursor)
+    conn.commit()
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('ANALYZE')
+    conn.close()
+    models_simple.close_pool()
+
+    size_mb = os.path.getsize(args.db) / 1024 / 1024
+    log(f"tayyor: {len(tests)} test, {written} natija, {size_mb:.1f} MB -> {args.db}", started)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""SQL tracing va N+1 aniqlash (ixtiyoriy)
+
+Yoqish: SQL_TRACE=1 muhit o'zgaruvchisi, debug rejimi yoki testlarda
+collect(). Yoqilganda get_db() connection lariga sqlite3 trace callback
+o'rnatiladi va har bir so'rov uchun bajarilgan statement'lar
+normallashtirilib yig'iladi.
+
+N+1: bir xil ko'rinishdagi statement bitta so'rov ichida Python dan
+SQL_TRACE_REPEAT_LIMIT martadan ko'p chaqirilsa, ogohlantirish chiqadi.
+Chaqiruvlar soni TimedCursor hook'idan olinadi, shuning uchun bitta
+executemany (ichida ko'p INSERT bo'lsa ham) bitta chaqiruv hisoblanadi.
+"""
+import os
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import request
+
+import models_simple
+
+REPEAT_LIMIT = int(os.environ.get('SQL_TRACE_REPEAT_LIMIT', 5))
+
+_string_literal = re.compile(r"'(?:[^']|'')*'")
+_blob_literal = re.compile(r"\b[xX]\?")
+_number_literal = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b')
+_placeholder_list = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_whitespace = re.compile(r'\s+')
+
+def normalize(sql):
+    """Statement ko'rinishi: qiymatlar ? ga, bo'sh joylar bittaga almashtiriladi"""
+    sql = _string_literal.sub('?', sql)
+    sql = _blob_literal.sub('?', sql)
+    sql = _number_literal.sub('?', sql)
+    sql = _placeholder_list.sub('(?, ...)', sql)
+    return _whitespace.sub(' ', sql).strip()
+
+class QueryReport:
+    """Bitta so'rov (yoki collect() bloki) davomidagi SQL hisoboti"""
+
+    def __init__(self, label=''):
+        self.label = label
+        self.statements = Counter()  # trace callback: bajarilgan statement'lar (ko'rinish bo'yicha)
+        self.calls = Counter()       # Python dan chaqiruvlar soni (ko'rinish bo'yicha)
+        self.seconds = 0.0
+
+    def repeated(self, limit=None):
+        """limit martadan ko'p chaqirilgan ko'rinishlar - N+1 shubhasi"""
+        limit = REPEAT_LIMIT if limit is None else limit
+        return [(shape, count) for shape, count in self.calls.most_common() if count > limit]
+
+    def format(self, top=10):
+        lines = [
+            f"SQL hisobot {self.label}: {sum(self.calls.values())} ta chaqiruv, "
+            f"{sum(self.statements.values())} ta statement, {self.seconds * 1000:.1f} ms"
+        ]
+        for shape, count in self.calls.most_common():
+            mark = '  N+1?' if count > REPEAT_LIMIT else ''
+            lines.append(f"  {count:4d} x {shape}{mark}")
+        # SQLite ichida takrorlangan statement'lar (executemany, trigger) -
+        # chaqiruvlar sonidan farq qiladiganlari
+        executed = [
+            (shape, count) for shape, count in self.statements.most_common()
+            if count > 1 and count != self.calls.get(shape)
+        ]
+        if executed:
+            lines.append('  bajarilgan statement\'lar:')
+            for shape, count in executed[:top]:
+                lines.append(f"  {count:4d} x {shape}")
+        return '\n'.join(lines)
+
+_current = threading.local()
+_enabled = False
+_lock = threading.Lock()
+
+def _trace(statement):
+    report = getattr(_current, 'report', None)
+    if report is not None:
+        report.statements[normalize(statement)] += 1
+
+def _install(conn):
+    conn.set_trace_callback(_trace)
+
+def _on_statement(sql, elapsed):
+    report = getattr(_current, 'report', None)
+    if report is None:
+        return
+    if sql is not None:
+        report.calls[normalize(sql)] += 1
+    report.seconds += elapsed
+
+def enable():
+    """Barcha connection larda tracing ni yoqish"""
+    global _enabled
+    with _lock:
+        if _enabled:
+            return
+        _enabled = True
+    models_simple.add_connection_hook(_install)
+    models_simple.statement_hooks.append(_on_statement)
+
+def start(label=''):
+    _current.report = QueryReport(label)
+    return _current.report
+
+def finish():
+    report = getattr(_current, 'report', None)
+    _current.report = None
+    return report
+
+@contextmanager
+def collect(label='collect'):
+    """Testlar uchun: blok ichidagi SQL hisobotini yig'ish
+
+        with sql_trace.collect() as report:
+            client.get('/api/tests/123456')
+        assert not report.repeated()
+    """
+    enable()
+    previous = getattr(_current, 'report', None)
+    report = start(label)
+    try:
+        yield report
+    finally:
+        _current.report = previous
+
+def init_sql_trace(app, verbose=False):
+    """Flask app uchun so'rov boshiga SQL hisobotini yoqish
+
+    Takrorlanuvchi statement'lar doim log qilinadi. verbose (debug/test)
+    rejimida har bir so'rov hisoboti chop etiladi va javobga X-SQL-Calls,
+    X-SQL-Repeated sarlavhalari qo'shiladi.
+    """
+    enable()
+
+    @app.before_request
+    def _start_trace():
+        if getattr(_current, 'report', None) is None:
+            start(f'{request.method} {request.path}')
+            _current.owned = True
+
+    @app.after_request
+    def _report_headers(response):
+        report = getattr(_current, 'report', None)
+        if verbose and report is not None:
+            response.headers['X-SQL-Calls'] = str(sum(report.calls.values()))
+            response.headers['X-SQL-Repeated'] = str(len(report.repeated()))
+        return response
+
+    @app.teardown_request
+    def _finish_trace(exc):
+        if not getattr(_current, 'owned', False):
+            return  # collect() bloki ichida - hisobot chaqiruvchiga tegishli
+        _current.owned = False
+        report = finish()
+        if report is None:
+            return
+        repeated = report.repeated()
+        if repeated:
+            for shape, count in repeated:
+                print(f"N+1 shubhasi ({report.label}): {count} marta: {shape}")
+        if verbose:
+            print(report.format())
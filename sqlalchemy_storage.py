@@ -0,0 +1,631 @@
+"""SQLAlchemy ombori (STORAGE_BACKEND=sqlalchemy)
+
+storage.SQLiteStorage bilan bir xil metodlar, lekin models.py modellari
+va pool'li engine orqali. DATABASE_URL berilmasa models_simple.DB_NAME
+dagi SQLite fayli ishlatiladi - u holda sxema models_simple
+migratsiyalari bilan yangilanadi va o'chirilgan testlar test_purger
+orqali fonda tozalanadi. Boshqa database (lokal Postgres) uchun jadvallar
+metadata.create_all bilan yaratiladi, o'chirilgan testlar esa shu
+omborning o'z TestPurger thread'ida (_purge_batch) bo'laklab tozalanadi.
+
+Qo'llab-quvvatlanadigan dialektlar: sqlite va postgresql (ikkalasida ham
+INSERT ... ON CONFLICT bor - login, natija va statistika bitta statement).
+
+SQLAlchemy ixtiyoriy kutubxona: pip install sqlalchemy (Postgres uchun
+psycopg ham).
+"""
+import asyncio
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+from functools import partial
+
+from sqlalchemy import and_, delete, func, insert, or_, select, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+import models
+from models import (
+    Answer, Image, IdAllocator, Question, Test, TestResult, TestStats, User,
+    load_test, make_engine, make_session_factory, utc_now
+)
+from models_simple import init_db, prepare_image, rank_bucket_split, score_bucket, STATS_BUCKETS
+from cache import LRUCache
+from purge import TestPurger, test_purger
+from id_allocator import ID_DIGITS, ID_SPACE, permute
+from catalog import CatalogVersion
+from scoring import AnswerKey, cached_answer_key, invalidate_answer_key
+from storage import escape_like
+
+_STATS_COLUMNS = ['result_count', 'score_sum', 'score_sq_sum'] + [
+    f'bucket_{i}' for i in range(STATS_BUCKETS)
+]
+
+# Reyting tartibi (storage.RANK_ORDER bilan bir xil)
+RANK_ORDER = (
+    TestResult.score.desc(), TestResult.correct_answers.desc(),
+    TestResult.completed_at, TestResult.id
+)
+
+_RESULT_COLUMNS = (
+    TestResult.id, TestResult.user_id, TestResult.score, TestResult.correct_answers,
+    TestResult.total_questions, TestResult.completed_at
+)
+
+class _EngineCatalogVersion(CatalogVersion):
+    """catalog.CatalogVersion - versiya engine orqali o'qiladi"""
+
+    def __init__(self, sessions, ttl):
+        super().__init__(ttl=ttl)
+        self._sessions = sessions
+
+    def _load(self):
+        with self._sessions() as session:
+            row = session.get(models.CatalogVersion, 'tests')
+            if row is None:
+                return None
+            return (
+                f'{row.epoch}-{row.version}',
+                datetime.fromtimestamp(row.updated_at, tz=timezone.utc)
+            )
+
+class SQLAlchemyStorage:
+    """models.py modellari ustidagi ombor"""
+
+    name = 'sqlalchemy'
+
+    def __init__(self, url=None, user_cache_size=10000):
+        self.url = url
+        self.user_cache = LRUCache(maxsize=user_cache_size)
+        self.engine = None
+        self.sessions = None
+        self._catalog = None
+        self._insert = None
+        self._purger = None
+        self._init_lock = threading.Lock()
+
+    def init(self):
+        """Engine va sxemani faqat kerak bo'lganda tayyorlash"""
+        if self.engine is not None:
+            return
+        with self._init_lock:
+            if self.engine is not None:
+                return
+            url = self.url or os.environ.get('DATABASE_URL')
+            # models_simple fayli: sxema va fonda tozalash models_simple/purge orqali
+            shared_sqlite = not url
+            if shared_sqlite:
+                init_db()
+            engine = make_engine(url)
+            if engine.dialect.name == 'sqlite':
+                insert = sqlite.insert
+            elif engine.dialect.name == 'postgresql':
+                insert = postgresql.insert
+            else:
+                raise ValueError(
+                    f"SQLAlchemy ombori {engine.dialect.name} ni qo'llab-quvvatlamaydi (sqlite yoki postgresql)"
+                )
+            models.Base.metadata.create_all(engine)
+            sessions = make_session_factory(engine)
+            with sessions.begin() as session:
+                session.execute(insert(IdAllocator).values(
+                    name='tests', counter=0, secret=secrets.token_hex(16)
+                ).on_conflict_do_nothing(index_elements=['name']))
+                session.execute(insert(models.CatalogVersion).values(
+                    name='tests', version=0, epoch=secrets.token_hex(4), updated_at=int(time.time())
+                ).on_conflict_do_nothing(index_elements=['name']))
+            self._insert = insert
+            # Server database: test_purger sozlamalari bilan, lekin shu engine orqali
+            self._purger = test_purger if shared_sqlite else TestPurger(
+                batch_size=test_purger.batch_size,
+                pause_ms=test_purger.pause * 1000,
+                enabled=test_purger.enabled,
+                batch=self._purge_batch,
+            )
+            self.sessions = sessions
+            self._catalog = _EngineCatalogVersion(
+                sessions, ttl=float(os.environ.get('CATALOG_VERSION_TTL', 1.0))
+            )
+            self.engine = engine
+        # Oldingi ishga tushirishda tozalanmay qolgan testlar
+        for test_id in self._pending_deleted():
+            self._purger.schedule(test_id)
+
+    def _session(self):
+        self.init()
+        return self.sessions()
+
+    def _pending_deleted(self):
+        with self.sessions() as session:
+            return session.scalars(select(Test.id).where(Test.deleted_at.is_not(None))).all()
+
+    def catalog_version(self):
+        self.init()
+        return self._catalog.current()
+
+    def _bump_catalog(self, session):
+        session.execute(
+            update(models.CatalogVersion)
+            .where(models.CatalogVersion.name == 'tests')
+            .values(version=models.CatalogVersion.version + 1, updated_at=int(time.time()))
+        )
+
+    # ---------- Foydalanuvchilar ----------
+
+    def login(self, user_id, name):
+        """Foydalanuvchini yaratish (mavjud bo'lsa o'zgartirmaslik), ismini qaytarish"""
+        user_name = self.user_cache.get(user_id)
+        if user_name is not None:
+            return user_name
+        with self._session() as session, session.begin():
+            user_name = session.scalar(
+                self._insert(User).values(id=user_id, name=name, created_at=utc_now())
+                .on_conflict_do_nothing(index_elements=['id'])
+                .returning(User.name)
+            )
+            if user_name is None:
+                user_name = session.scalar(select(User.name).where(User.id == user_id))
+        self.user_cache.set(user_id, user_name)
+        return user_name
+
+    def user_names(self, user_ids):
+        """user_id -> ism; keshda yo'qlari bitta IN so'rovi bilan olinadi"""
+        names = {}
+        missing = []
+        for user_id in set(user_ids):
+            name = self.user_cache.get(user_id)
+            if name is None:
+                missing.append(user_id)
+            else:
+                names[user_id] = name
+        if not missing:
+            return names
+        with self._session() as session:
+            for i in range(0, len(missing), 500):
+                chunk = missing[i:i + 500]
+                for user_id, name in session.execute(
+                    select(User.id, User.name).where(User.id.in_(chunk))
+                ):
+                    names[user_id] = name
+                    self.user_cache.set(user_id, name)
+        return names
+
+    # ---------- Testlar ----------
+
+    def list_tests(self, class_level=None, subject=None, after=None, limit=50, search=None):
+        """O'chirilmagan testlar, yangilari birinchi; after - (created_at, id) cursor"""
+        query = select(
+            Test.id, Test.name, Test.image, Test.image_hash, Test.class_level,
+            Test.duration_minutes, Test.subject, Test.created_at
+        ).where(Test.deleted_at.is_(None))
+        if search:
+            query = query.where(or_(
+                Test.name.ilike(f'%{escape_like(search)}%', escape='\\'), Test.id == search
+            ))
+        if class_level:
+            query = query.where(Test.class_level == class_level)
+        if subject:
+            query = query.where(Test.subject == subject)
+        if after:
+            query = query.where(tuple_(Test.created_at, Test.id) < tuple(after))
+        query = query.order_by(Test.created_at.desc(), Test.id.desc()).limit(limit)
+        with self._session() as session:
+            return [dict(row) for row in session.execute(query).mappings()]
+
+    def get_test(self, test_id):
+        """Test savollari va javob variantlari bilan (dict), topilmasa None
+
+        Savollar soni qancha bo'lmasin - 3 ta so'rov (models.load_test).
+        """
+        with self._session() as session:
+            test = load_test(session, test_id)
+            if test is None:
+                return None
+            return {
+                'id': test.id,
+                'name': test.name,
+                'class_level': test.class_level,
+                'duration_minutes': test.duration_minutes,
+                'subject': test.subject,
+                'image': test.image,
+                'image_hash': test.image_hash,
+                'questions': [
+                    {
+                        'id': question.id,
+                        'question_text': question.question_text,
+                        'answers': [
+                            {'id': answer.id, 'variant': answer.variant, 'text': answer.text}
+                            for answer in question.answers
+                        ]
+                    }
+                    for question in test.questions
+                ]
+            }
+
+    def test_info(self, test_id):
+        """O'chirilmagan testning nomi, sinfi va vaqti, topilmasa None"""
+        with self._session() as session:
+            return session.execute(
+                select(Test.name, Test.class_level, Test.duration_minutes)
+                .where(Test.id == test_id, Test.deleted_at.is_(None))
+            ).mappings().first()
+
+    def _allocate_test_id(self, session):
+        """id_allocator.allocate_test_id bilan bir xil ketma-ketlik
+
+        Hisoblagich avval oshiriladi - qator lock'i tranzaksiya oxirigacha
+        ushlab turiladi va parallel yaratishlar bir xil ID olmaydi.
+        """
+        while True:
+            session.execute(
+                update(IdAllocator).where(IdAllocator.name == 'tests')
+                .values(counter=IdAllocator.counter + 1)
+            )
+            counter, secret = session.execute(
+                select(IdAllocator.counter, IdAllocator.secret).where(IdAllocator.name == 'tests')
+            ).one()
+            if counter > ID_SPACE:
+                raise Exception('Bo\'sh test ID qolmadi')
+            test_id = str(permute(counter - 1, secret)).zfill(ID_DIGITS)
+            # Eski (tasodifiy yaratilgan) ID ga to'g'ri kelsa - keyingisi
+            if session.scalar(select(Test.id).where(Test.id == test_id)) is None:
+                return test_id
+
+    def _insert_questions(self, session, test_id, questions):
+        """Savollar va javob variantlarini guruhlab yozish (savollar sonidan qat'i nazar 2-3 so'rov)
+
+        Postgres: savollar bitta INSERT ... RETURNING bilan, ID lar
+        parametrlar tartibida qaytadi. SQLite da bunday kafolat yo'q -
+        models_simple.insert_questions kabi ID lar oldindan ajratiladi
+        (id_allocator qatori allaqachon yangilangan, ya'ni tranzaksiya
+        write lock ushlab turibdi).
+        """
+        rows = [
+            {'test_id': test_id, 'question_text': question_text, 'correct_answer': correct_answer}
+            for question_text, correct_answer, _answers in questions
+        ]
+        if not rows:
+            return
+        if self.engine.dialect.name == 'sqlite':
+            last_id = max(
+                session.scalar(text("SELECT seq FROM sqlite_sequence WHERE name = 'questions'")) or 0,
+                session.scalar(select(func.max(Question.id))) or 0
+            )
+            question_ids = list(range(last_id + 1, last_id + 1 + len(rows)))
+            for question_id, row in zip(question_ids, rows):
+                row['id'] = question_id
+            session.execute(insert(Question), rows)
+        else:
+            question_ids = session.scalars(
+                insert(Question).returning(Question.id, sort_by_parameter_order=True), rows
+            ).all()
+        answer_rows = [
+            {'question_id': question_id, 'variant': variant, 'text': text_value}
+            for question_id, (_text, _correct, answers) in zip(question_ids, questions)
+            for variant, text_value in answers
+        ]
+        if answer_rows:
+            session.execute(insert(Answer), answer_rows)
+
+    def create_test(self, name, class_level, duration_minutes, subject, questions, image=None,
+                    image_url=None):
+        """Testni savollari bilan bitta tranzaksiyada yozish"""
+        if isinstance(image, str):
+            image = prepare_image(image)
+        with self._session() as session, session.begin():
+            test_id = self._allocate_test_id(session)
+            image_hash = None
+            if image:
+                image_hash, mime_type, data = image
+                session.execute(
+                    self._insert(Image)
+                    .values(hash=image_hash, mime_type=mime_type, data=data, created_at=utc_now())
+                    .on_conflict_do_nothing(index_elements=['hash'])
+                )
+            session.execute(insert(Test).values(
+                id=test_id, name=name, image=image_url, image_hash=image_hash,
+                class_level=class_level, duration_minutes=duration_minutes, subject=subject,
+                created_at=utc_now()
+            ))
+            self._insert_questions(session, test_id, questions)
+            self._bump_catalog(session)
+        self._catalog.invalidate()
+        return test_id
+
+    def delete_test(self, test_id):
+        """Testni darhol yashirish, keyin qatorlarini tozalash; topilmasa False"""
+        with self._session() as session, session.begin():
+            deleted = session.execute(
+                update(Test).where(Test.id == test_id, Test.deleted_at.is_(None))
+                .values(deleted_at=utc_now())
+            ).rowcount
+            if not deleted:
+                return False
+            session.execute(delete(TestStats).where(TestStats.test_id == test_id))
+            self._bump_catalog(session)
+        self._catalog.invalidate()
+        invalidate_answer_key(test_id)
+        self._purger.schedule(test_id)  # Fonda bo'laklab
+        return True
+
+    def _purge_batch(self, test_id, batch_size):
+        """purge.purge_batch ning server database varianti: bir bo'lak, qisqa tranzaksiyada
+
+        Test to'liq tozalangan bo'lsa True qaytaradi.
+        """
+        with self._session() as session, session.begin():
+            result_ids = (
+                select(TestResult.id).where(TestResult.test_id == test_id).limit(batch_size)
+            )
+            if session.execute(delete(TestResult).where(TestResult.id.in_(result_ids))).rowcount:
+                return False
+
+            # Javoblar savollar bilan bir xil to'plam bo'yicha o'chiriladi
+            question_ids = (
+                select(Question.id).where(Question.test_id == test_id)
+                .order_by(Question.id).limit(batch_size)
+            ).scalar_subquery()
+            session.execute(delete(Answer).where(Answer.question_id.in_(question_ids)))
+            if session.execute(delete(Question).where(Question.id.in_(question_ids))).rowcount:
+                return False
+
+            image_hash = session.scalar(select(Test.image_hash).where(Test.id == test_id))
+            session.execute(delete(TestStats).where(TestStats.test_id == test_id))
+            session.execute(delete(Test).where(Test.id == test_id, Test.deleted_at.is_not(None)))
+            if image_hash:
+                session.execute(
+                    delete(Image).where(
+                        Image.hash == image_hash,
+                        ~select(Test.id).where(Test.image_hash == image_hash).exists()
+                    )
+                )
+        return True
+
+    def test_stats(self, test_id):
+        """Test nomi va test_stats ustunlari (read_test_stats uchun), topilmasa None"""
+        with self._session() as session:
+            row = session.execute(
+                select(Test.name, *(getattr(TestStats, column) for column in _STATS_COLUMNS))
+                .outerjoin(TestStats, TestStats.test_id == Test.id)
+                .where(Test.id == test_id, Test.deleted_at.is_(None))
+            ).mappings().first()
+            return dict(row) if row is not None else None
+
+    def test_image(self, test_id):
+        """Test rasmi (hash, mime_type, data), topilmasa None"""
+        with self._session() as session:
+            return session.execute(
+                select(Image.hash, Image.mime_type, Image.data)
+                .join(Test, Test.image_hash == Image.hash)
+                .where(Test.id == test_id, Test.deleted_at.is_(None))
+            ).mappings().first()
+
+    def answer_key(self, test_id):
+        """Kompilyatsiya qilingan javoblar kaliti, test topilmasa None"""
+        with self._session() as session:
+            exists = session.scalar(
+                select(Test.id).where(Test.id == test_id, Test.deleted_at.is_(None))
+            )
+            if exists is None:
+                return None
+            # Kalit scoring keshida saqlanadi (SQLite ombori bilan umumiy)
+            return cached_answer_key(test_id, lambda: AnswerKey(test_id, session.execute(
+                select(Question.id, Question.correct_answer)
+                .where(Question.test_id == test_id).order_by(Question.id)
+            ).all()))
+
+    # ---------- Natijalar ----------
+
+    def _add_stats(self, session, test_id, score):
+        values = {'test_id': test_id, 'result_count': 1, 'score_sum': score,
+                  'score_sq_sum': score * score}
+        values.update({f'bucket_{i}': 0 for i in range(STATS_BUCKETS)})
+        values[f'bucket_{score_bucket(score)}'] = 1
+        statement = self._insert(TestStats).values(**values)
+        session.execute(statement.on_conflict_do_update(
+            index_elements=['test_id'],
+            set_={
+                column: getattr(TestStats, column) + getattr(statement.excluded, column)
+                for column in _STATS_COLUMNS
+            }
+        ))
+
+    def add_result(self, test_id, user_id, score, correct_answers, total_questions):
+        """Natijani va statistikani bitta tranzaksiyada saqlash, (result_id, created)
+
+        Test oldin ishlangan bo'lsa, UNIQUE(test_id, user_id) tufayli yangi
+        qator yozilmaydi (created=False). Test o'chirilgan bo'lsa LookupError.
+        """
+        with self._session() as session, session.begin():
+            # FOR SHARE: tranzaksiya tugaguncha delete_test testni yashira olmaydi
+            # (SQLite da e'tiborsiz - yozuvchi baribir bitta)
+            live = session.scalar(
+                select(Test.id).where(Test.id == test_id, Test.deleted_at.is_(None))
+                .with_for_update(read=True)
+            )
+            if live is None:
+                raise LookupError('Test topilmadi')
+            result_id = session.scalar(
+                self._insert(TestResult).values(
+                    test_id=test_id, user_id=user_id, score=score,
+                    correct_answers=correct_answers, total_questions=total_questions,
+                    completed_at=utc_now()
+                )
+                .on_conflict_do_nothing(index_elements=['test_id', 'user_id'])
+                .returning(TestResult.id)
+            )
+            if result_id is None:
+                return session.scalar(
+                    select(TestResult.id)
+                    .where(TestResult.test_id == test_id, TestResult.user_id == user_id)
+                ), False
+            self._add_stats(session, test_id, score)
+        return result_id, True
+
+    async def add_result_async(self, test_id, user_id, score, correct_answers, total_questions,
+                               executor=None):
+        """add_result() executor thread'ida (event loop bloklanmaydi)"""
+        return await asyncio.get_running_loop().run_in_executor(executor, partial(
+            self.add_result, test_id, user_id, score, correct_answers, total_questions
+        ))
+
+    def test_results(self, test_id, sort='completed_at', after=None, limit=100):
+        """Test natijalari sahifasi (keyset pagination)
+
+        sort='completed_at': yangilari birinchi, after = (completed_at, id).
+        sort='score': reyting tartibida, after = (score, correct, completed_at, id).
+        """
+        query = select(*_RESULT_COLUMNS).where(TestResult.test_id == test_id)
+        if sort == 'completed_at':
+            if after:
+                query = query.where(tuple_(TestResult.completed_at, TestResult.id) < tuple(after))
+            query = query.order_by(TestResult.completed_at.desc(), TestResult.id.desc())
+        else:
+            if after:
+                score, correct, completed_at, result_id = after
+                query = query.where(TestResult.score <= score, or_(
+                    TestResult.score < score,
+                    and_(TestResult.score == score, TestResult.correct_answers < correct),
+                    and_(TestResult.score == score, TestResult.correct_answers == correct,
+                         TestResult.completed_at > completed_at),
+                    and_(TestResult.score == score, TestResult.correct_answers == correct,
+                         TestResult.completed_at == completed_at, TestResult.id > result_id),
+                ))
+            query = query.order_by(*RANK_ORDER)
+        with self._session() as session:
+            return [dict(row) for row in session.execute(query.limit(limit)).mappings()]
+
+    def user_results(self, user_id, after=None, limit=50):
+        """Foydalanuvchi natijalari test nomi bilan, yangilari birinchi"""
+        query = (
+            select(
+                TestResult.id, TestResult.test_id, Test.name.label('test_name'),
+                TestResult.score, TestResult.correct_answers, TestResult.total_questions,
+                TestResult.completed_at
+            )
+            .outerjoin(Test, Test.id == TestResult.test_id)
+            .where(TestResult.user_id == user_id, Test.deleted_at.is_(None))
+        )
+        if after:
+            query = query.where(tuple_(TestResult.completed_at, TestResult.id) < tuple(after))
+        query = query.order_by(TestResult.completed_at.desc(), TestResult.id.desc()).limit(limit)
+        with self._session() as session:
+            return [dict(row) for row in session.execute(query).mappings()]
+
+    def user_test_result(self, test_id, user_id):
+        """Foydalanuvchining shu testdagi natijasi - UNIQUE(test_id, user_id) indeksi orqali"""
+        with self._session() as session:
+            return session.execute(
+                select(
+                    TestResult.id, TestResult.score, TestResult.correct_answers,
+                    TestResult.total_questions, TestResult.completed_at
+                )
+                .join(Test, Test.id == TestResult.test_id)
+                .where(TestResult.test_id == test_id, TestResult.user_id == user_id,
+                       Test.deleted_at.is_(None))
+            ).mappings().first()
+
+    def get_result(self, result_id):
+        """Bitta natija test nomi bilan (test_name), topilmasa None"""
+        try:
+            result_id = int(result_id)
+        except (TypeError, ValueError):
+            return None
+        with self._session() as session:
+            return session.execute(
+                select(TestResult.test_id, *_RESULT_COLUMNS, Test.name.label('test_name'))
+                .outerjoin(Test, Test.id == TestResult.test_id)
+                .where(TestResult.id == result_id)
+            ).mappings().first()
+
+    def _result_count(self, session, test_id):
+        # Umumiy natijalar soni test_stats da saqlanadi (O(1))
+        count = session.scalar(
+            select(TestStats.result_count).where(TestStats.test_id == test_id)
+        )
+        return count or 0
+
+    def leaderboard(self, test_id, limit):
+        """Reytingning eng yaxshi limit ta natijasi va umumiy natijalar soni"""
+        with self._session() as session:
+            rows = session.execute(
+                select(*_RESULT_COLUMNS).where(TestResult.test_id == test_id)
+                .order_by(*RANK_ORDER).limit(limit)
+            ).mappings().all()
+            return rows, self._result_count(session, test_id)
+
+    def user_rank(self, test_id, user_id):
+        """(natija, o'rin, umumiy soni), foydalanuvchi testni ishlamagan bo'lsa None
+
+        SQLiteStorage.user_rank kabi: COUNT faqat [ball, oraliq chegarasi)
+        qismidagi natijalar soniga chiziqli.
+        """
+        with self._session() as session:
+            result = session.execute(
+                select(*_RESULT_COLUMNS)
+                .join(Test, Test.id == TestResult.test_id)
+                .where(TestResult.test_id == test_id, TestResult.user_id == user_id,
+                       Test.deleted_at.is_(None))
+            ).mappings().first()
+            if result is None:
+                return None
+            # O'rin = o'zidan yuqoridagi natijalar soni + 1: yuqori oraliqlar
+            # histogrammadan, o'z oralig'i reyting indeksi oraliqlaridan
+            score = result['score']
+            correct = result['correct_answers']
+            completed_at = result['completed_at']
+            stats = session.execute(
+                select(TestStats.__table__).where(TestStats.test_id == test_id)
+            ).mappings().first()
+            above, upper = rank_bucket_split(stats, score)
+            better = above + session.scalar(
+                select(func.count()).select_from(TestResult)
+                .where(TestResult.test_id == test_id,
+                       TestResult.score >= score, TestResult.score < upper, or_(
+                    TestResult.score > score,
+                    and_(TestResult.score == score, TestResult.correct_answers > correct),
+                    and_(TestResult.score == score, TestResult.correct_answers == correct,
+                         TestResult.completed_at < completed_at),
+                    and_(TestResult.score == score, TestResult.correct_answers == correct,
+                         TestResult.completed_at == completed_at, TestResult.id < result['id']),
+                ))
+            )
+            return result, better + 1, stats['result_count'] if stats else 0
+
+    def _test_id_stats(self):
+        """ID maydoni statistikasi, database ishlamasa None"""
+        try:
+            with self._session() as session:
+                allocated = session.scalar(
+                    select(IdAllocator.counter).where(IdAllocator.name == 'tests')
+                ) or 0
+        except Exception:
+            return None
+        return {
+            'allocated': allocated,
+            'capacity': ID_SPACE,
+            'used_fraction': round(allocated / ID_SPACE, 6),
+        }
+
+    def _pool_stats(self):
+        if self.engine is None:
+            return None
+        pool = self.engine.pool
+        return {
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+        }
+
+    def stats(self):
+        """Ombor statistikasi (/api/health uchun)"""
+        return {
+            'storage': self.name,
+            'dialect': self.engine.dialect.name if self.engine is not None else None,
+            'db_pool': self._pool_stats(),
+            'user_cache': self.user_cache.stats(),
+            'test_purger': self._purger.stats() if self._purger is not None else None,
+            'test_ids': self._test_id_stats(),
+        }
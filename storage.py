@@ -0,0 +1,951 @@
+"""Ma'lumotlar ombori (repository) qatlami
+
+app_simple route'lari SQL o'rniga shu qatlam metodlarini chaqiradi.
+Ikki xil amalga oshirish bor, tanlash STORAGE_BACKEND muhit
+o'zgaruvchisi orqali:
+
+    sqlite  - (standart) models_simple connection pool'i ustida SQLite
+    memory  - faqat xotirada (dict va indekslar), disk I/O siz.
+              Benchmark'lar uchun nol-I/O asos va bitta serverli imtihon
+              uchun "hammasi RAM da" rejimi. Jarayon to'xtasa ma'lumotlar
+              yo'qoladi, gunicorn bilan faqat bitta worker ishlatilsin.
+    sqlalchemy - models.py modellari va pool'li engine (DATABASE_URL,
+              masalan lokal Postgres); sqlalchemy_storage.py ga qarang.
+
+Barcha klasslar bir xil metodlarga ega. Qatorlar ['maydon'] orqali
+o'qiladi (sqlite3.Row yoki dict). Reyting tartibi hammasida bir xil:
+foiz, to'g'ri javoblar soni kamayish bo'yicha, keyin tezroq tugatgan.
+"""
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timezone
+
+from models_simple import (
+    get_db, init_db, pool_stats, prepare_image, store_image, insert_questions,
+    rank_bucket_split, score_bucket, STATS_BUCKETS
+)
+from cache import LRUCache
+from result_writer import result_writer
+from purge import test_purger
+from id_allocator import ID_DIGITS, ID_SPACE, allocate_test_id, id_space_stats, permute
+from catalog import bump_catalog_version, catalog_version
+from scoring import AnswerKey, get_answer_key, invalidate_answer_key
+
+# Reyting tartibi: idx_test_results_rank indeksi bilan bir xil bo'lishi kerak
+RANK_ORDER = 'r.score DESC, r.correct_answers DESC, r.completed_at, r.id'
+
+# INSERT ... RETURNING SQLite 3.35 dan boshlab mavjud
+UPSERT_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+class SQLiteStorage:
+    """models_simple pool'i ustidagi SQLite ombori"""
+
+    name = 'sqlite'
+
+    def __init__(self, user_cache_size=10000):
+        # Foydalanuvchi ismlari keshi (user_id -> name).
+        # Ism login da bir marta yoziladi va keyin o'zgarmaydi - invalidatsiya kerak emas.
+        self.user_cache = LRUCache(maxsize=user_cache_size)
+        self._initialized = False
+
+    def init(self):
+        """Database ni faqat kerak bo'lganda tayyorlash (sxema migratsiyalari)"""
+        if self._initialized:
+            return
+        try:
+            init_db()
+            self._initialized = True
+            # Oldingi ishga tushirishda tozalanmay qolgan testlar
+            conn = get_db()
+            try:
+                test_purger.schedule_pending(conn.cursor())
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Database initialization warning: {e}")
+            self._initialized = True  # Xatolikni qayta-qayta ko'rsatmaslik uchun
+
+    def connect(self):
+        """Database connection olish, xatolikni boshqarish"""
+        try:
+            self.init()
+            return get_db()
+        except Exception as e:
+            error_msg = str(e)
+            if "SQLite" in error_msg or "read-only" in error_msg.lower():
+                raise Exception("SQLite Vercel'da ishlamaydi. Iltimos, cloud database (Vercel Postgres, Supabase, va hokazo) sozlang.")
+            raise
+
+    def catalog_version(self):
+        """Katalog versiyasi (etag, last_modified) - TTL ichida database ga murojaatsiz"""
+        self.init()
+        return catalog_version.current()
+
+    # ---------- Foydalanuvchilar ----------
+
+    def login(self, user_id, name):
+        """Foydalanuvchini yaratish (mavjud bo'lsa o'zgartirmaslik), ismini qaytarish"""
+        user_name = self.user_cache.get(user_id)
+        if user_name is not None:
+            return user_name  # Tanish foydalanuvchi - database ga murojaatsiz
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            # Bitta statement: yangi foydalanuvchi yaratiladi va ismi qaytadi,
+            # mavjud bo'lsa hech narsa yozilmaydi va qator qaytmaydi
+            if UPSERT_RETURNING:
+                cursor.execute(
+                    'INSERT INTO users (id, name) VALUES (?, ?) ON CONFLICT(id) DO NOTHING RETURNING name',
+                    (user_id, name)
+                )
+            else:
+                cursor.execute('INSERT OR IGNORE INTO users (id, name) VALUES (?, ?)', (user_id, name))
+            row = cursor.fetchone() if UPSERT_RETURNING else None
+            conn.commit()
+            if row is None:
+                cursor.execute('SELECT name FROM users WHERE id = ?', (user_id,))
+                row = cursor.fetchone()
+        finally:
+            conn.close()
+        self.user_cache.set(user_id, row['name'])
+        return row['name']
+
+    def user_names(self, user_ids):
+        """user_id -> ism; keshda yo'qlari bitta IN so'rovi bilan olinadi"""
+        names = {}
+        missing = []
+        for user_id in set(user_ids):
+            name = self.user_cache.get(user_id)
+            if name is None:
+                missing.append(user_id)
+            else:
+                names[user_id] = name
+        if not missing:
+            return names
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            # SQLite parametrlar limiti (eski versiyalarda 999)
+            for i in range(0, len(missing), 500):
+                chunk = missing[i:i + 500]
+                cursor.execute(
+                    f"SELECT id, name FROM users WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                for row in cursor.fetchall():
+                    names[row['id']] = row['name']
+                    self.user_cache.set(row['id'], row['name'])
+        finally:
+            conn.close()
+        return names
+
+    # ---------- Testlar ----------
+
+    def list_tests(self, class_level=None, subject=None, after=None, limit=50, search=None):
+        """O'chirilmagan testlar, yangilari birinchi; after - (created_at, id) cursor
+
+        search - nomning bir qismi (katta-kichik harf farqsiz) yoki aniq test ID.
+        """
+        # Filtrlar va cursor (created_at, id) indekslari orqali bajariladi.
+        # Nom bo'yicha qidiruv indekssiz: idx_tests_created tartibida o'qib LIMIT da to'xtaydi
+        conditions = ['deleted_at IS NULL']
+        params = []
+        if search:
+            conditions.append("(name LIKE ? ESCAPE '\\' OR id = ?)")
+            params.extend([f'%{escape_like(search)}%', search])
+        if class_level:
+            conditions.append('class_level = ?')
+            params.append(class_level)
+        if subject:
+            conditions.append('subject = ?')
+            params.append(subject)
+        if after:
+            conditions.append('(created_at, id) < (?, ?)')
+            params.extend(after)
+        where = 'WHERE ' + ' AND '.join(conditions)
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f'''
+                SELECT id, name, image, image_hash, class_level, duration_minutes, subject, created_at
+                FROM tests {where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+                ''',
+                (*params, limit)
+            )
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def get_test(self, test_id):
+        """Test savollari va javob variantlari bilan (dict), topilmasa None"""
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            # Test, savollar va javob variantlarini bitta so'rov bilan olish
+            cursor.execute(
+                '''
+                SELECT t.id, t.name, t.class_level, t.duration_minutes, t.subject,
+                       t.image, t.image_hash,
+                       q.id AS question_id, q.question_text,
+                       a.id AS answer_id, a.variant, a.text
+                FROM tests t
+                LEFT JOIN questions q ON q.test_id = t.id
+                LEFT JOIN answers a ON a.question_id = q.id
+                WHERE t.id = ? AND t.deleted_at IS NULL
+                ORDER BY q.id, a.id
+                ''',
+                (test_id,)
+            )
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return None
+
+        questions = []
+        current_question = None
+        for row in rows:
+            if row['question_id'] is None:
+                continue  # Testda savol yo'q
+            if current_question is None or current_question['id'] != row['question_id']:
+                current_question = {
+                    'id': row['question_id'],
+                    'question_text': row['question_text'],
+                    'answers': []
+                }
+                questions.append(current_question)
+            if row['answer_id'] is not None:
+                current_question['answers'].append({
+                    'id': row['answer_id'],
+                    'variant': row['variant'],
+                    'text': row['text']
+                })
+        test = dict(rows[0])
+        return {
+            'id': test['id'],
+            'name': test['name'],
+            'class_level': test['class_level'],
+            'duration_minutes': test['duration_minutes'],
+            'subject': test['subject'],
+            'image': test['image'],
+            'image_hash': test['image_hash'],
+            'questions': questions
+        }
+
+    def test_info(self, test_id):
+        """O'chirilmagan testning nomi, sinfi va vaqti, topilmasa None"""
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT name, class_level, duration_minutes FROM tests WHERE id = ? AND deleted_at IS NULL',
+                (test_id,)
+            )
+            return cursor.fetchone()
+        finally:
+            conn.close()
+
+    def create_test(self, name, class_level, duration_minutes, subject, questions, image=None,
+                    image_url=None):
+        """Testni savollari bilan bitta qisqa tranzaksiyada yozish
+
+        questions - normalize_question() natijalari ro'yxati, image -
+        prepare_image() natijasi, image_url - tashqi rasm manzili. Barcha qatorlar oldindan tayyorlanadi,
+        tranzaksiya ichida faqat executemany bajariladi.
+        """
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+
+            # Takrorlanmas ID hisoblagich orqali ajratiladi (tekshirib-qayta urinishsiz)
+            test_id = allocate_test_id(cursor)
+
+            image_hash = store_image(cursor, image) if image else None
+
+            # Test yaratish (rasm bilan yoki rasm siz)
+            cursor.execute(
+                '''
+                INSERT INTO tests (id, name, image, image_hash, class_level, duration_minutes, subject)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (test_id, name, image_url, image_hash, class_level, duration_minutes, subject)
+            )
+
+            # Savollar va javoblar yaratish
+            insert_questions(cursor, test_id, questions)
+            bump_catalog_version(cursor)
+
+            conn.commit()
+        finally:
+            conn.close()
+        catalog_version.invalidate()
+        return test_id
+
+    def delete_test(self, test_id):
+        """Testni darhol yashirish, qatorlarini fonda tozalash; topilmasa False"""
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            # Savollar va natijalar fonda bo'laklab tozalanadi
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute(
+                'UPDATE tests SET deleted_at = CURRENT_TIMESTAMP WHERE id = ? AND deleted_at IS NULL',
+                (test_id,)
+            )
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return False
+            cursor.execute('DELETE FROM test_stats WHERE test_id = ?', (test_id,))
+            bump_catalog_version(cursor)
+            conn.commit()
+        finally:
+            conn.close()
+        catalog_version.invalidate()
+        invalidate_answer_key(test_id)
+        test_purger.schedule(test_id)
+        return True
+
+    def test_stats(self, test_id):
+        """Test nomi va test_stats ustunlari (read_test_stats uchun), topilmasa None"""
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                SELECT t.name, s.*
+                FROM tests t LEFT JOIN test_stats s ON s.test_id = t.id
+                WHERE t.id = ? AND t.deleted_at IS NULL
+                ''',
+                (test_id,)
+            )
+            return cursor.fetchone()
+        finally:
+            conn.close()
+
+    def test_image(self, test_id):
+        """Test rasmi (hash, mime_type, data), topilmasa None"""
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                SELECT i.hash, i.mime_type, i.data
+                FROM tests t JOIN images i ON i.hash = t.image_hash
+                WHERE t.id = ? AND t.deleted_at IS NULL
+                ''',
+                (test_id,)
+            )
+            return cursor.fetchone()
+        finally:
+            conn.close()
+
+    def answer_key(self, test_id):
+        """Kompilyatsiya qilingan javoblar kaliti, test topilmasa None"""
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1 FROM tests WHERE id = ? AND deleted_at IS NULL', (test_id,))
+            if not cursor.fetchone():
+                return None
+            # Kalit keshda saqlanadi
+            return get_answer_key(cursor, test_id)
+        finally:
+            conn.close()
+
+    # ---------- Natijalar ----------
+
+    def add_result(self, test_id, user_id, score, correct_answers, total_questions):
+        """Natijani saqlash, (result_id, created) qaytaradi
+
+        Writer boshqa so'rovlar bilan birga bitta tranzaksiyada yozadi.
+        Test oldin ishlangan bo'lsa, UNIQUE(test_id, user_id) tufayli yangi
+        qator yozilmaydi (created=False). Test o'chirilgan bo'lsa LookupError.
+        """
+        self.init()
+        return result_writer.submit(test_id, user_id, score, correct_answers, total_questions)
+
+    async def add_result_async(self, test_id, user_id, score, correct_answers, total_questions,
+                               executor=None):
+        """add_result() ning asyncio varianti (kutish paytida thread band qilinmaydi)"""
+        return await result_writer.submit_async(
+            test_id, user_id, score, correct_answers, total_questions, executor=executor
+        )
+
+    def test_results(self, test_id, sort='completed_at', after=None, limit=100):
+        """Test natijalari sahifasi (keyset pagination)
+
+        sort='completed_at': yangilari birinchi, after = (completed_at, id).
+        sort='score': reyting tartibida, after = (score, correct, completed_at, id).
+        """
+        params = [test_id]
+        if sort == 'completed_at':
+            order = 'r.completed_at DESC, r.id DESC'
+            keyset = ''
+            if after:
+                keyset = 'AND (r.completed_at, r.id) < (?, ?)'
+                params.extend(after)
+        else:
+            order = RANK_ORDER
+            keyset = ''
+            if after:
+                score, correct, completed_at, result_id = after
+                keyset = '''
+                AND r.score <= ? AND (
+                    r.score < ?
+                    OR (r.score = ? AND r.correct_answers < ?)
+                    OR (r.score = ? AND r.correct_answers = ? AND r.completed_at > ?)
+                    OR (r.score = ? AND r.correct_answers = ? AND r.completed_at = ? AND r.id > ?)
+                )'''
+                params.extend([score, score, score, correct, score, correct, completed_at,
+                               score, correct, completed_at, result_id])
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            # Har bir sahifa indeksdagi oraliqdan o'qiladi
+            cursor.execute(
+                f'''
+                SELECT r.id, r.user_id, r.score, r.correct_answers, r.total_questions, r.completed_at
+                FROM test_results r
+                WHERE r.test_id = ? {keyset}
+                ORDER BY {order}
+                LIMIT ?
+                ''',
+                (*params, limit)
+            )
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def user_results(self, user_id, after=None, limit=50):
+        """Foydalanuvchi natijalari test nomi bilan, yangilari birinchi"""
+        keyset = ''
+        params = [user_id]
+        if after:
+            keyset = 'AND (r.completed_at, r.id) < (?, ?)'
+            params.extend(after)
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            # Test nomlari bitta JOIN bilan olinadi
+            cursor.execute(
+                f'''
+                SELECT r.id, r.test_id, t.name AS test_name, r.score, r.correct_answers,
+                       r.total_questions, r.completed_at
+                FROM test_results r
+                LEFT JOIN tests t ON t.id = r.test_id
+                WHERE r.user_id = ? AND t.deleted_at IS NULL {keyset}
+                ORDER BY r.completed_at DESC, r.id DESC
+                LIMIT ?
+                ''',
+                (*params, limit)
+            )
+            return cursor.fetchall()
+        finally:
+            conn.close()
+
+    def user_test_result(self, test_id, user_id):
+        """Foydalanuvchining shu testdagi natijasi - UNIQUE(test_id, user_id) indeksi orqali"""
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                SELECT r.id, r.score, r.correct_answers, r.total_questions, r.completed_at
+                FROM test_results r
+                JOIN tests t ON t.id = r.test_id
+                WHERE r.test_id = ? AND r.user_id = ? AND t.deleted_at IS NULL
+                ''',
+                (test_id, user_id)
+            )
+            return cursor.fetchone()
+        finally:
+            conn.close()
+
+    def get_result(self, result_id):
+        """Bitta natija test nomi bilan (test_name), topilmasa None"""
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                SELECT r.*, t.name AS test_name
+                FROM test_results r LEFT JOIN tests t ON t.id = r.test_id
+                WHERE r.id = ?
+                ''',
+                (result_id,)
+            )
+            return cursor.fetchone()
+        finally:
+            conn.close()
+
+    def _result_count(self, cursor, test_id):
+        # Umumiy natijalar soni test_stats da saqlanadi (O(1))
+        cursor.execute('SELECT result_count FROM test_stats WHERE test_id = ?', (test_id,))
+        stats = cursor.fetchone()
+        return stats['result_count'] if stats else 0
+
+    def leaderboard(self, test_id, limit):
+        """Reytingning eng yaxshi limit ta natijasi va umumiy natijalar soni"""
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            # Reyting indeksi bo'yicha tartibda o'qib, LIMIT da to'xtaydi
+            cursor.execute(
+                f'''
+                SELECT r.id, r.user_id, r.score, r.correct_answers, r.total_questions, r.completed_at
+                FROM test_results r
+                WHERE r.test_id = ?
+                ORDER BY {RANK_ORDER}
+                LIMIT ?
+                ''',
+                (test_id, limit)
+            )
+            rows = cursor.fetchall()
+            return rows, self._result_count(cursor, test_id)
+        finally:
+            conn.close()
+
+    def user_rank(self, test_id, user_id):
+        """(natija, o'rin, umumiy soni), foydalanuvchi testni ishlamagan bo'lsa None
+
+        Narxi: yuqori ball oraliqlari test_stats histogrammasidan O(1) da
+        olinadi, COUNT esa reyting indeksining [ball, oraliq chegarasi)
+        qismini o'qiydi - shu qismdagi natijalar soniga chiziqli. Eng yomon
+        holatda (barcha natijalar bitta oraliqda) bu umumiy natijalar soni.
+        """
+        conn = self.connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                SELECT r.id, r.score, r.correct_answers, r.total_questions, r.completed_at
+                FROM test_results r
+                JOIN tests t ON t.id = r.test_id
+                WHERE r.test_id = ? AND r.user_id = ? AND t.deleted_at IS NULL
+                ''',
+                (test_id, user_id)
+            )
+            result = cursor.fetchone()
+            if not result:
+                return None
+
+            # O'rin = o'zidan yuqoridagi natijalar soni + 1: yuqori oraliqlar
+            # histogrammadan, o'z oralig'i reyting indeksidagi oraliq qidiruvlaridan.
+            score = result['score']
+            correct = result['correct_answers']
+            completed_at = result['completed_at']
+            cursor.execute('SELECT * FROM test_stats WHERE test_id = ?', (test_id,))
+            stats = cursor.fetchone()
+            above, upper = rank_bucket_split(stats, score)
+            cursor.execute(
+                '''
+                SELECT COUNT(*) FROM test_results
+                WHERE test_id = ? AND score >= ? AND score < ? AND (
+                    score > ?
+                    OR (score = ? AND correct_answers > ?)
+                    OR (score = ? AND correct_answers = ? AND completed_at < ?)
+                    OR (score = ? AND correct_answers = ? AND completed_at = ? AND id < ?)
+                )
+                ''',
+                (test_id, score, upper, score, score, correct, score, correct, completed_at,
+                 score, correct, completed_at, result['id'])
+            )
+            better = above + cursor.fetchone()[0]
+            return result, better + 1, stats['result_count'] if stats else 0
+        finally:
+            conn.close()
+
+    def _test_id_stats(self):
+        """ID maydoni statistikasi, database ishlamasa None"""
+        try:
+            conn = self.connect()
+        except Exception:
+            return None
+        try:
+            return id_space_stats(conn.cursor())
+        except Exception:
+            return None
+        finally:
+            conn.close()
+
+    def stats(self):
+        """Ombor statistikasi (/api/health uchun)"""
+        return {
+            'storage': self.name,
+            'db_pool': pool_stats(),
+            'user_cache': self.user_cache.stats(),
+            'result_writer': result_writer.stats(),
+            'test_purger': test_purger.stats(),
+            'test_ids': self._test_id_stats(),
+        }
+
+def escape_like(value):
+    """LIKE naqshidagi maxsus belgilarni ekranlash (ESCAPE '\\')"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _now():
+    """SQLite CURRENT_TIMESTAMP bilan bir xil format (UTC)"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+def _rank_key(result):
+    """Reyting tartibi uchun saralash kaliti (kichigi yuqorida)"""
+    return (-result['score'], -result['correct_answers'], result['completed_at'], result['id'])
+
+class MemoryStorage:
+    """Faqat xotiradagi ombor - dict lar va saralangan indekslar
+
+    Barcha o'zgarishlar va o'qishlar bitta lock ostida. Indekslar:
+        _test_order     - (created_at, id) saralangan ro'yxat (testlar katalogi)
+        _by_test        - test_id -> (completed_at, id) ro'yxati (qo'shilish tartibida)
+        _rank           - test_id -> _rank_key lar saralangan ro'yxati
+        _by_user        - user_id -> (completed_at, id) ro'yxati
+        _by_test_user   - (test_id, user_id) -> result_id
+    """
+
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._users = {}
+        self._tests = {}
+        self._test_order = []
+        self._images = {}
+        self._results = {}
+        self._by_test = {}
+        self._rank = {}
+        self._by_user = {}
+        self._by_test_user = {}
+        self._stats = {}
+        self._id_secret = secrets.token_hex(16)
+        self._id_counter = 0
+        self._question_seq = 0
+        self._answer_seq = 0
+        self._result_seq = 0
+        self._epoch = secrets.token_hex(4)
+        self._version = 0
+        self._updated_at = int(time.time())
+
+    def init(self):
+        pass  # Sxema yo'q
+
+    def catalog_version(self):
+        with self._lock:
+            return (
+                f'{self._epoch}-{self._version}',
+                datetime.fromtimestamp(self._updated_at, tz=timezone.utc)
+            )
+
+    def _bump_catalog(self):
+        self._version += 1
+        self._updated_at = int(time.time())
+
+    # ---------- Foydalanuvchilar ----------
+
+    def login(self, user_id, name):
+        with self._lock:
+            return self._users.setdefault(user_id, name)
+
+    def user_names(self, user_ids):
+        with self._lock:
+            return {uid: self._users[uid] for uid in set(user_ids) if uid in self._users}
+
+    # ---------- Testlar ----------
+
+    def list_tests(self, class_level=None, subject=None, after=None, limit=50, search=None):
+        needle = search.lower() if search else None
+        with self._lock:
+            end = bisect_left(self._test_order, tuple(after)) if after else len(self._test_order)
+            rows = []
+            for i in range(end - 1, -1, -1):
+                test = self._tests[self._test_order[i][1]]
+                if class_level and test['class_level'] != class_level:
+                    continue
+                if subject and test['subject'] != subject:
+                    continue
+                if needle and needle not in test['name'].lower() and test['id'] != search:
+                    continue
+                rows.append({key: test[key] for key in (
+                    'id', 'name', 'image', 'image_hash', 'class_level',
+                    'duration_minutes', 'subject', 'created_at'
+                )})
+                if len(rows) >= limit:
+                    break
+            return rows
+
+    def get_test(self, test_id):
+        with self._lock:
+            test = self._tests.get(test_id)
+            if test is None:
+                return None
+            return {
+                'id': test['id'],
+                'name': test['name'],
+                'class_level': test['class_level'],
+                'duration_minutes': test['duration_minutes'],
+                'subject': test['subject'],
+                'image': test['image'],
+                'image_hash': test['image_hash'],
+                'questions': [
+                    {
+                        'id': q['id'],
+                        'question_text': q['question_text'],
+                        'answers': [dict(a) for a in q['answers']]
+                    }
+                    for q in test['questions']
+                ]
+            }
+
+    def test_info(self, test_id):
+        with self._lock:
+            test = self._tests.get(test_id)
+            if test is None:
+                return None
+            return {
+                'name': test['name'],
+                'class_level': test['class_level'],
+                'duration_minutes': test['duration_minutes'],
+            }
+
+    def _allocate_test_id(self):
+        while True:
+            if self._id_counter >= ID_SPACE:
+                raise Exception('Bo\'sh test ID qolmadi')
+            test_id = str(permute(self._id_counter, self._id_secret)).zfill(ID_DIGITS)
+            self._id_counter += 1
+            if test_id not in self._tests:
+                return test_id
+
+    def create_test(self, name, class_level, duration_minutes, subject, questions, image=None,
+                    image_url=None):
+        with self._lock:
+            test_id = self._allocate_test_id()
+            image_hash = None
+            if image:
+                if isinstance(image, str):
+                    image = prepare_image(image)
+                image_hash, mime_type, data = image
+                self._images.setdefault(image_hash, (mime_type, data))
+            question_list = []
+            for question_text, correct_answer, answers in questions:
+                self._question_seq += 1
+                answer_list = []
+                for variant, text in answers:
+                    self._answer_seq += 1
+                    answer_list.append({'id': self._answer_seq, 'variant': variant, 'text': text})
+                question_list.append({
+                    'id': self._question_seq,
+                    'question_text': question_text,
+                    'correct_answer': correct_answer,
+                    'answers': answer_list,
+                })
+            test = {
+                'id': test_id,
+                'name': name,
+                'image': image_url,
+                'image_hash': image_hash,
+                'class_level': class_level,
+                'duration_minutes': duration_minutes,
+                'subject': subject,
+                'created_at': _now(),
+                'questions': question_list,
+                'answer_key': AnswerKey(
+                    test_id, [(q['id'], q['correct_answer']) for q in question_list]
+                ),
+            }
+            self._tests[test_id] = test
+            insort(self._test_order, (test['created_at'], test_id))
+            self._bump_catalog()
+            return test_id
+
+    def delete_test(self, test_id):
+        """Test va uning natijalarini darhol o'chirish (xotirada - arzon)"""
+        with self._lock:
+            test = self._tests.pop(test_id, None)
+            if test is None:
+                return False
+            self._test_order.remove((test['created_at'], test_id))
+            affected_users = set()
+            for _completed_at, result_id in self._by_test.pop(test_id, []):
+                result = self._results.pop(result_id)
+                self._by_test_user.pop((test_id, result['user_id']), None)
+                affected_users.add(result['user_id'])
+            for user_id in affected_users:
+                self._by_user[user_id] = [
+                    key for key in self._by_user[user_id] if key[1] in self._results
+                ]
+            self._rank.pop(test_id, None)
+            self._stats.pop(test_id, None)
+            image_hash = test['image_hash']
+            if image_hash and not any(t['image_hash'] == image_hash for t in self._tests.values()):
+                self._images.pop(image_hash, None)
+            self._bump_catalog()
+            return True
+
+    def test_stats(self, test_id):
+        with self._lock:
+            test = self._tests.get(test_id)
+            if test is None:
+                return None
+            # Natija bo'lmasa - LEFT JOIN dagi kabi bo'sh ustunlar
+            row = dict.fromkeys(
+                ['result_count', 'score_sum', 'score_sq_sum']
+                + [f'bucket_{i}' for i in range(STATS_BUCKETS)]
+            )
+            row.update(self._stats.get(test_id, {}))
+            row['name'] = test['name']
+            return row
+
+    def test_image(self, test_id):
+        with self._lock:
+            test = self._tests.get(test_id)
+            if test is None or test['image_hash'] not in self._images:
+                return None
+            mime_type, data = self._images[test['image_hash']]
+            return {'hash': test['image_hash'], 'mime_type': mime_type, 'data': data}
+
+    def answer_key(self, test_id):
+        with self._lock:
+            test = self._tests.get(test_id)
+            return test['answer_key'] if test is not None else None
+
+    # ---------- Natijalar ----------
+
+    def _add_stats(self, test_id, score):
+        stats = self._stats.get(test_id)
+        if stats is None:
+            stats = self._stats[test_id] = dict(
+                {'result_count': 0, 'score_sum': 0.0, 'score_sq_sum': 0.0},
+                **{f'bucket_{i}': 0 for i in range(STATS_BUCKETS)}
+            )
+        stats['result_count'] += 1
+        stats['score_sum'] += score
+        stats['score_sq_sum'] += score * score
+        stats[f'bucket_{score_bucket(score)}'] += 1
+
+    def add_result(self, test_id, user_id, score, correct_answers, total_questions):
+        with self._lock:
+            existing = self._by_test_user.get((test_id, user_id))
+            if existing is not None:
+                return existing, False
+            if test_id not in self._tests:
+                raise LookupError('Test topilmadi')
+            self._result_seq += 1
+            result = {
+                'id': self._result_seq,
+                'test_id': test_id,
+                'user_id': user_id,
+                'score': score,
+                'correct_answers': correct_answers,
+                'total_questions': total_questions,
+                'completed_at': _now(),
+            }
+            self._results[result['id']] = result
+            self._by_test_user[(test_id, user_id)] = result['id']
+            order_key = (result['completed_at'], result['id'])
+            insort(self._by_test.setdefault(test_id, []), order_key)
+            insort(self._by_user.setdefault(user_id, []), order_key)
+            insort(self._rank.setdefault(test_id, []), _rank_key(result))
+            self._add_stats(test_id, score)
+            return result['id'], True
+
+    async def add_result_async(self, test_id, user_id, score, correct_answers, total_questions,
+                               executor=None):
+        # Disk I/O yo'q - event loop thread'ida darhol bajariladi
+        return self.add_result(test_id, user_id, score, correct_answers, total_questions)
+
+    def test_results(self, test_id, sort='completed_at', after=None, limit=100):
+        with self._lock:
+            if sort == 'completed_at':
+                keys = self._by_test.get(test_id, [])
+                end = bisect_left(keys, tuple(after)) if after else len(keys)
+                ids = [keys[i][1] for i in range(end - 1, max(end - limit, 0) - 1, -1)]
+            else:
+                keys = self._rank.get(test_id, [])
+                start = 0
+                if after:
+                    score, correct, completed_at, result_id = after
+                    start = bisect_right(keys, (-score, -correct, completed_at, result_id))
+                ids = [key[-1] for key in keys[start:start + limit]]
+            return [dict(self._results[i]) for i in ids]
+
+    def user_results(self, user_id, after=None, limit=50):
+        with self._lock:
+            keys = self._by_user.get(user_id, [])
+            end = bisect_left(keys, tuple(after)) if after else len(keys)
+            rows = []
+            for i in range(end - 1, max(end - limit, 0) - 1, -1):
+                result = dict(self._results[keys[i][1]])
+                result['test_name'] = self._tests[result['test_id']]['name']
+                rows.append(result)
+            return rows
+
+    def user_test_result(self, test_id, user_id):
+        with self._lock:
+            result_id = self._by_test_user.get((test_id, user_id))
+            return dict(self._results[result_id]) if result_id is not None else None
+
+    def get_result(self, result_id):
+        with self._lock:
+            try:
+                result = self._results.get(int(result_id))
+            except (TypeError, ValueError):
+                return None
+            if result is None:
+                return None
+            test = self._tests.get(result['test_id'])
+            return dict(result, test_name=test['name'] if test else None)
+
+    def _result_count(self, test_id):
+        return len(self._by_test.get(test_id, ()))
+
+    def leaderboard(self, test_id, limit):
+        with self._lock:
+            keys = self._rank.get(test_id, [])
+            rows = [dict(self._results[key[-1]]) for key in keys[:limit]]
+            return rows, self._result_count(test_id)
+
+    def user_rank(self, test_id, user_id):
+        with self._lock:
+            result_id = self._by_test_user.get((test_id, user_id))
+            if result_id is None:
+                return None
+            result = self._results[result_id]
+            # O'rin = saralangan reyting indeksidagi o'rni + 1 (O(log n))
+            rank = bisect_left(self._rank[test_id], _rank_key(result)) + 1
+            return dict(result), rank, self._result_count(test_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'storage': self.name,
+                'users': len(self._users),
+                'tests': len(self._tests),
+                'results': len(self._results),
+                'images': len(self._images),
+                'test_ids': {
+                    'allocated': self._id_counter,
+                    'capacity': ID_SPACE,
+                    'used_fraction': round(self._id_counter / ID_SPACE, 6),
+                },
+            }
+
+def create_storage(backend=None):
+    """STORAGE_BACKEND (sqlite, memory yoki sqlalchemy) bo'yicha omborni yaratish"""
+    backend = backend or os.environ.get('STORAGE_BACKEND', 'sqlite')
+    user_cache_size = int(os.environ.get('USER_CACHE_SIZE', 10000))
+    if backend == 'sqlite':
+        return SQLiteStorage(user_cache_size=user_cache_size)
+    if backend == 'memory':
+        return MemoryStorage()
+    if backend == 'sqlalchemy':
+        # SQLAlchemy faqat shu ombor tanlanganda import qilinadi
+        from sqlalchemy_storage import SQLAlchemyStorage
+        return SQLAlchemyStorage(user_cache_size=user_cache_size)
+    raise ValueError(f"Noma'lum STORAGE_BACKEND: {backend} (sqlite, memory yoki sqlalchemy)")